@@ -0,0 +1,185 @@
+import os
+import time
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+from report_writer import write_report, resolve_formats, REPORT_FORMATS
+
+
+class AttendanceComplianceForecaster:
+    """Monte Carlo forecast of end-of-term attendance per section and school against the 80% target"""
+
+    def __init__(self, db_path='school_management.db', threshold=0.80, trials=10000, remaining_days=40,
+                 term_end=None, prior_strength=10, batch_size=2000, max_draws=50_000_000, seed=42):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.trials = trials
+        self.remaining_days = remaining_days  # school days left when no term_end is given
+        self.term_end = term_end
+        self.prior_strength = prior_strength  # pseudo-classes of the school-wide rate added to each student
+        self.max_draws = max_draws  # above trials x students draws, simulate section totals instead of students
+        self.batch_size = batch_size  # trials simulated per batch, bounds the (trials x students) arrays
+        self.seed = seed
+
+    def load_students(self, connection):
+        """Per-student presence counts and class days from one aggregate query"""
+        return pd.read_sql_query("""
+            SELECT s.student_id, s.school_id, s.section_id, g.grade_name, sec.section_name,
+                   COALESCE(a.present, 0) as present,
+                   COALESCE(a.total, 0) as total,
+                   COALESCE(a.days, 0) as days,
+                   a.last_date
+            FROM students s
+            JOIN grades g ON s.grade_id = g.grade_id
+            JOIN sections sec ON s.section_id = sec.section_id
+            LEFT JOIN (
+                SELECT student_id,
+                       SUM(status = 'Present') as present,
+                       COUNT(*) as total,
+                       COUNT(DISTINCT attendance_date) as days,
+                       MAX(attendance_date) as last_date
+                FROM attendance
+                GROUP BY student_id
+            ) a ON s.student_id = a.student_id
+            ORDER BY s.school_id, g.grade_level, sec.section_name, s.section_id, s.student_id
+        """, connection)
+
+    def school_days_left(self, students):
+        """Weekdays after the latest recorded class up to the end of term"""
+        last_dates = students['last_date'].dropna()
+        if self.term_end is None or last_dates.empty:
+            return self.remaining_days
+        last_date = np.datetime64(last_dates.max(), 'D')
+        return int(max(0, np.busday_count(last_date + 1, np.datetime64(self.term_end, 'D') + 1)))
+
+    def simulate(self, students, days_left):
+        """Future present classes of every section in every trial, shape (trials, sections)"""
+        present = students['present'].to_numpy(dtype=float)
+        absent = students['total'].to_numpy(dtype=float) - present
+        days = students['days'].to_numpy(dtype=float)
+        # Classes each student still has this term, at their own classes-per-day pace
+        sessions_per_day = np.divide(present + absent, days, out=np.zeros_like(days), where=days > 0)
+        remaining = np.rint(sessions_per_day * days_left).astype(np.int64)
+
+        # Beta posterior of each student's presence probability, shrunk towards the school-wide rate
+        observed = present.sum() + absent.sum()
+        school_rate = present.sum() / observed if observed else self.threshold
+        alpha = present + self.prior_strength * school_rate
+        beta = absent + self.prior_strength * (1 - school_rate)
+
+        # Students arrive sorted by school and section, so groups are contiguous column ranges
+        section_keys = students[['school_id', 'section_id']].to_numpy()
+        section_starts = np.flatnonzero(np.r_[True, (section_keys[1:] != section_keys[:-1]).any(axis=1)])
+        section_total = np.add.reduceat(present + absent + remaining, section_starts)
+        section_present = np.add.reduceat(present, section_starts)
+
+        rng = np.random.default_rng(self.seed)
+        if self.trials * len(students) <= self.max_draws:
+            simulated = np.empty((self.trials, len(section_starts)))
+            for start in range(0, self.trials, self.batch_size):
+                count = min(self.batch_size, self.trials - start)
+                probability = rng.beta(alpha, beta, size=(count, len(students)))
+                future_present = rng.binomial(remaining, probability)
+                simulated[start:start + count] = np.add.reduceat(future_present, section_starts, axis=1)
+        else:
+            # District scale: draw section totals from the summed beta-binomial mean and variance
+            mean_rate = alpha / (alpha + beta)
+            mean = remaining * mean_rate
+            variance = mean * (1 - mean_rate) * (alpha + beta + remaining) / (alpha + beta + 1)
+            section_mean = np.add.reduceat(mean, section_starts)
+            section_std = np.sqrt(np.add.reduceat(variance, section_starts))
+            section_remaining = np.add.reduceat(remaining, section_starts)
+            simulated = np.clip(rng.normal(section_mean, section_std, size=(self.trials, len(section_starts))),
+                                0, section_remaining)
+
+        return section_starts, section_present, section_total, simulated
+
+    def _summary(self, scope, labels, students, present, total, final_present, final_total):
+        final_rate = np.divide(final_present, final_total, out=np.zeros_like(final_present),
+                               where=final_total > 0)
+        current_total = np.asarray(total, dtype=float)
+        return pd.DataFrame({
+            'Scope': scope,
+            'Name': labels,
+            'Students': students,
+            'Current_Rate': np.divide(present, current_total, out=np.zeros_like(current_total),
+                                      where=current_total > 0) * 100,
+            'Expected_Final_Rate': final_rate.mean(axis=0) * 100,
+            'P5_Final_Rate': np.percentile(final_rate, 5, axis=0) * 100,
+            'P95_Final_Rate': np.percentile(final_rate, 95, axis=0) * 100,
+            'P_Below_Threshold': (final_rate < self.threshold).mean(axis=0)
+        })
+
+    def forecast(self, connection=None):
+        """Return (per section and school forecast DataFrame, school days simulated)"""
+        own_connection = connection is None
+        if own_connection:
+            connection = sqlite3.connect(self.db_path)
+        try:
+            students = self.load_students(connection)
+        finally:
+            if own_connection:
+                connection.close()
+
+        days_left = self.school_days_left(students)
+        starts, section_present, section_total, simulated = self.simulate(students, days_left)
+
+        sections = students.iloc[starts]
+        section_sizes = np.diff(np.r_[starts, len(students)])
+        section_current_total = np.add.reduceat(students['total'].to_numpy(dtype=float), starts)
+        section_frame = self._summary(
+            'Section', (sections['grade_name'] + ' - ' + sections['section_name']).to_numpy(), section_sizes,
+            section_present, section_current_total,
+            section_present + simulated, np.broadcast_to(section_total, simulated.shape)
+        )
+
+        # Sections are contiguous within each school, so schools are sums of adjacent sections
+        school_ids = sections['school_id'].to_numpy()
+        school_starts = np.flatnonzero(np.r_[True, school_ids[1:] != school_ids[:-1]])
+        school_frame = self._summary(
+            'School', [f"School {school_id}" for school_id in school_ids[school_starts]],
+            np.add.reduceat(section_sizes, school_starts),
+            np.add.reduceat(section_present, school_starts), np.add.reduceat(section_current_total, school_starts),
+            np.add.reduceat(section_present + simulated, school_starts, axis=1),
+            np.broadcast_to(np.add.reduceat(section_total, school_starts), (self.trials, len(school_starts)))
+        )
+
+        return pd.concat([school_frame, section_frame], ignore_index=True), days_left
+
+
+def main(trials=10000, threshold=0.80, remaining_days=40, term_end=None, formats=('xlsx',)):
+    print("=" * 80)
+    print(f"🎲 ATTENDANCE COMPLIANCE FORECAST (target {threshold:.0%})")
+    print("=" * 80)
+
+    forecaster = AttendanceComplianceForecaster(threshold=threshold, trials=trials,
+                                                remaining_days=remaining_days, term_end=term_end)
+    start = time.perf_counter()
+    forecast, days_left = forecaster.forecast()
+    elapsed = time.perf_counter() - start
+    print(f"✅ {trials} trials of {days_left} remaining school days simulated in {elapsed * 1000:.0f} ms")
+
+    for row in forecast.itertuples(index=False):
+        flag = '⚠️' if row.P_Below_Threshold >= 0.05 else '✅'
+        print(f"  {flag} {row.Scope} {row.Name}: now {row.Current_Rate:.1f}%, expected {row.Expected_Final_Rate:.1f}% "
+              f"(90% range {row.P5_Final_Rate:.1f}-{row.P95_Final_Rate:.1f}%), "
+              f"P(below {threshold:.0%}) = {row.P_Below_Threshold:.1%}")
+
+    os.makedirs('ml_model', exist_ok=True)
+    saved = write_report('ml_model/attendance_compliance_forecast', {'Sheet1': forecast}, resolve_formats(formats))
+    print(f"📁 Forecast saved: {', '.join(saved)}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo forecast of end-of-term attendance compliance")
+    parser.add_argument('--trials', type=int, default=10000)
+    parser.add_argument('--threshold', type=float, default=0.80, help="minimum attendance rate (default: 0.80)")
+    parser.add_argument('--remaining-days', type=int, default=40, help="school days left in term (default: 40)")
+    parser.add_argument('--term-end', default=None, help="last day of term (YYYY-MM-DD), overrides --remaining-days")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=['xlsx'],
+                        help="forecast file formats (default: xlsx; parquet needs pyarrow)")
+    args = parser.parse_args()
+    main(trials=args.trials, threshold=args.threshold, remaining_days=args.remaining_days, term_end=args.term_end,
+         formats=args.formats)
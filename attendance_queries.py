@@ -0,0 +1,196 @@
+import os
+import re
+import time
+import sqlite3
+import argparse
+import pandas as pd
+from report_writer import write_report, resolve_formats, REPORT_FORMATS
+
+# Covering indexes: a student's date range, or a date range across the school, is read without table lookups
+ATTENDANCE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_attendance_student_date "
+    "ON attendance(student_id, attendance_date, status, subject_id, teacher_id)",
+    "CREATE INDEX IF NOT EXISTS idx_attendance_date "
+    "ON attendance(attendance_date, status, subject_id, teacher_id, student_id)",
+    "CREATE INDEX IF NOT EXISTS idx_students_grade_section ON students(grade_id, section_id)",
+)
+
+SUMMARY_COLUMNS = ['Student_Name', 'Grade', 'Section', 'Present_Days', 'Total_Days', 'Attendance_Percentage']
+RECORD_COLUMNS = ['Attendance_Date', 'Student_Name', 'Grade', 'Section', 'Subject', 'Teacher', 'Status']
+
+
+def ensure_attendance_indexes(connection):
+    """Create the filtered-attendance indexes (skipped on read-only databases)"""
+    try:
+        for statement in ATTENDANCE_INDEXES:
+            connection.execute(statement)
+        connection.commit()
+    except sqlite3.OperationalError:
+        connection.rollback()
+
+
+class AttendanceQuery:
+    """Attendance filtered by date range, grade, section, subject, teacher and status
+
+    grade, subject and teacher match an id (grade_level for grades) when given an int, else a name.
+    Dates are inclusive 'YYYY-MM-DD' strings.
+    """
+
+    def __init__(self, start_date=None, end_date=None, grade=None, section=None, subject=None, teacher=None,
+                 status=None):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.grade = grade
+        self.section = section
+        self.subject = subject
+        self.teacher = teacher
+        self.status = status
+
+    def _student_conditions(self):
+        """Conditions on students s, with their parameters; id lists let idx_students_grade_section find the slice"""
+        clauses, params = [], []
+        if self.grade is not None:
+            clauses.append("s.grade_id IN (SELECT grade_id FROM grades WHERE grade_level = ?)"
+                           if isinstance(self.grade, int)
+                           else "s.grade_id IN (SELECT grade_id FROM grades WHERE grade_name = ?)")
+            params.append(self.grade)
+        if self.section is not None:
+            clauses.append("s.section_id IN (SELECT section_id FROM sections WHERE section_name = ?)")
+            params.append(self.section)
+        return clauses, params
+
+    def _attendance_conditions(self):
+        """Conditions on attendance a, with their parameters; all are sargable on the attendance indexes"""
+        clauses, params = [], []
+        if self.start_date is not None:
+            clauses.append("a.attendance_date >= ?")
+            params.append(self.start_date)
+        if self.end_date is not None:
+            # Compared as text, so timestamps later on the end date still fall inside the range
+            clauses.append("a.attendance_date < date(?, '+1 day')")
+            params.append(self.end_date)
+        if self.status is not None:
+            clauses.append("a.status = ?")
+            params.append(self.status)
+        if self.subject is not None:
+            clauses.append("a.subject_id = ?" if isinstance(self.subject, int)
+                           else "a.subject_id IN (SELECT subject_id FROM subjects WHERE subject_name = ?)")
+            params.append(self.subject)
+        if self.teacher is not None:
+            clauses.append("a.teacher_id = ?" if isinstance(self.teacher, int)
+                           else "a.teacher_id IN (SELECT teacher_id FROM teachers WHERE teacher_name = ?)")
+            params.append(self.teacher)
+        return clauses, params
+
+    def summary_sql(self, shard_columns=''):
+        """(sql, params) of one row per matching student, like the attendance report"""
+        student_clauses, student_params = self._student_conditions()
+        attendance_clauses, attendance_params = self._attendance_conditions()
+        # Attendance filters sit in the join, so students without matching classes still get a row
+        join = ''.join(f" AND {clause}" for clause in attendance_clauses)
+        where = f"WHERE {' AND '.join(student_clauses)}" if student_clauses else ""
+        sql = f"""
+            SELECT {shard_columns}
+                s.student_name,
+                g.grade_name,
+                sec.section_name,
+                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present_days,
+                COUNT(a.attendance_id) as total_days,
+                ROUND((COUNT(CASE WHEN a.status = 'Present' THEN 1 END) * 100.0 / COUNT(a.attendance_id)), 2) as attendance_percentage
+            FROM students s
+            JOIN grades g ON s.grade_id = g.grade_id
+            JOIN sections sec ON s.section_id = sec.section_id
+            LEFT JOIN attendance a ON s.student_id = a.student_id{join}
+            {where}
+            GROUP BY s.student_id, s.student_name, g.grade_name, sec.section_name
+            ORDER BY {shard_columns}attendance_percentage DESC
+        """
+        return sql, attendance_params + student_params
+
+    def records_sql(self):
+        """(sql, params) of the matching attendance rows, oldest first"""
+        student_clauses, student_params = self._student_conditions()
+        attendance_clauses, attendance_params = self._attendance_conditions()
+        clauses = attendance_clauses + student_clauses
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        sql = f"""
+            SELECT a.attendance_date, s.student_name, g.grade_name, sec.section_name,
+                   sub.subject_name, t.teacher_name, a.status
+            FROM attendance a
+            JOIN students s ON a.student_id = s.student_id
+            JOIN grades g ON s.grade_id = g.grade_id
+            JOIN sections sec ON s.section_id = sec.section_id
+            LEFT JOIN subjects sub ON a.subject_id = sub.subject_id
+            LEFT JOIN teachers t ON a.teacher_id = t.teacher_id
+            {where}
+            ORDER BY a.attendance_date, s.student_id
+        """
+        return sql, attendance_params + student_params
+
+    def summary(self, connection):
+        sql, params = self.summary_sql()
+        return pd.DataFrame(connection.execute(sql, params).fetchall(), columns=SUMMARY_COLUMNS)
+
+    def records(self, connection):
+        sql, params = self.records_sql()
+        return pd.DataFrame(connection.execute(sql, params).fetchall(), columns=RECORD_COLUMNS)
+
+    def label(self):
+        """File-name friendly description of the filters, e.g. grade_7-section_B-2025-07-28_to_2025-08-03"""
+        parts = [f"{name}_{value}" for name, value in (('grade', self.grade), ('section', self.section),
+                                                       ('subject', self.subject), ('teacher', self.teacher),
+                                                       ('status', self.status)) if value is not None]
+        if self.start_date or self.end_date:
+            parts.append(f"{self.start_date or 'start'}_to_{self.end_date or 'end'}")
+        return re.sub(r'[^A-Za-z0-9_-]+', '_', '-'.join(parts)) or 'all'
+
+
+def main(query, records=False, formats=('xlsx',), reports_dir='reports'):
+    print("=" * 80)
+    print(f"📅 FILTERED ATTENDANCE: {query.label()}")
+    print("=" * 80)
+
+    connection = sqlite3.connect('school_management.db')
+    try:
+        ensure_attendance_indexes(connection)
+        start = time.perf_counter()
+        summary = query.summary(connection)
+        sheets = {'Summary': summary}
+        if records:
+            sheets['Records'] = query.records(connection)
+        elapsed = time.perf_counter() - start
+    finally:
+        connection.close()
+
+    attended = summary[summary['Total_Days'] > 0]
+    present, total = attended['Present_Days'].sum(), attended['Total_Days'].sum()
+    print(f"✅ {len(attended)} of {len(summary)} students had matching classes, queried in {elapsed * 1000:.0f} ms")
+    if total:
+        print(f"  📊 {present}/{total} present ({present * 100 / total:.1f}%)")
+
+    os.makedirs(reports_dir, exist_ok=True)
+    saved = write_report(os.path.join(reports_dir, f"attendance_{query.label()}"), sheets, resolve_formats(formats))
+    print(f"📁 Saved: {', '.join(saved)}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    def id_or_name(value):
+        return int(value) if value.isdigit() else value
+
+    parser = argparse.ArgumentParser(description="Attendance report for a date range, grade, section, subject, "
+                                                 "teacher or status")
+    parser.add_argument('--from', dest='start_date', default=None, help="first day (YYYY-MM-DD)")
+    parser.add_argument('--to', dest='end_date', default=None, help="last day (YYYY-MM-DD), inclusive")
+    parser.add_argument('--grade', type=id_or_name, default=None, help="grade level (7) or name ('Grade 7')")
+    parser.add_argument('--section', default=None, help="section name, e.g. B")
+    parser.add_argument('--subject', type=id_or_name, default=None, help="subject id or name")
+    parser.add_argument('--teacher', type=id_or_name, default=None, help="teacher id or name")
+    parser.add_argument('--status', default=None, choices=['Present', 'Absent'])
+    parser.add_argument('--records', action='store_true', help="also include every matching attendance row")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=['xlsx'],
+                        help="report file formats (default: xlsx; parquet needs pyarrow)")
+    args = parser.parse_args()
+    query = AttendanceQuery(start_date=args.start_date, end_date=args.end_date, grade=args.grade,
+                            section=args.section, subject=args.subject, teacher=args.teacher, status=args.status)
+    main(query, records=args.records, formats=args.formats)
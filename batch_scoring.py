@@ -0,0 +1,169 @@
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from feature_store import StudentFeatureStore, attendance_model_matrix, risk_model_matrix
+from model_registry import ModelRegistry
+from ml_inference import RISK_LABELS
+from report_writer import EXCEL_MAX_ROWS
+
+PREDICTIONS_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS ml_predictions (
+        student_id INTEGER NOT NULL,
+        model_name TEXT NOT NULL,
+        model_version INTEGER NOT NULL,
+        predicted_label TEXT,
+        predicted_value REAL,
+        p_low_risk REAL,
+        p_medium_risk REAL,
+        p_high_risk REAL,
+        feature_version TEXT,
+        scored_at DATETIME NOT NULL,
+        PRIMARY KEY (model_name, model_version, student_id)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_ml_predictions_student ON ml_predictions(student_id, model_name)",
+)
+
+PREDICTION_COLUMNS = ['student_id', 'model_name', 'model_version', 'predicted_label', 'predicted_value',
+                      'p_low_risk', 'p_medium_risk', 'p_high_risk', 'feature_version', 'scored_at']
+
+
+def has_attendance(frame):
+    return frame['total_classes'] > 0
+
+
+class ReportCollector:
+    """on_chunk callback keeping the first `limit` report rows built from each scored chunk"""
+
+    def __init__(self, build_rows, limit=EXCEL_MAX_ROWS):
+        self.build_rows = build_rows  # (feature chunk, predictions) -> report DataFrame
+        self.limit = limit
+        self.parts = []
+        self.rows = 0
+        self.truncated = False
+
+    def __call__(self, chunk, predictions):
+        if self.rows >= self.limit:
+            self.truncated = True
+            return
+        part = self.build_rows(chunk, predictions)
+        if self.rows + len(part) > self.limit:
+            part = part.iloc[:self.limit - self.rows]
+            self.truncated = True
+        self.parts.append(part)
+        self.rows += len(part)
+
+    def frame(self):
+        return pd.concat(self.parts, ignore_index=True) if self.parts else pd.DataFrame()
+
+
+class BatchScorer:
+    """Streams the feature store through a registered model, chunk by chunk, into ml_predictions"""
+
+    def __init__(self, db_path='school_management.db', registry=None, feature_store=None, chunk_size=10000):
+        self.db_path = db_path
+        self.registry = registry or ModelRegistry()
+        self.feature_store = feature_store or StudentFeatureStore(db_path)
+        self.chunk_size = chunk_size  # students per chunk, bounds feature and prediction memory
+
+    @staticmethod
+    def ensure_table(connection):
+        for statement in PREDICTIONS_SCHEMA:
+            connection.execute(statement)
+        connection.commit()
+
+    def _predict(self, model, X, classifier):
+        """Prediction columns for one chunk"""
+        n = len(X)
+        if not classifier:
+            return {'predicted_label': [None] * n, 'predicted_value': model.predict(X),
+                    'p_low_risk': None, 'p_medium_risk': None, 'p_high_risk': None}
+
+        probabilities = np.zeros((n, len(RISK_LABELS)))
+        probabilities[:, model.classes_.astype(int)] = model.predict_proba(X)  # classes absent from training stay 0
+        codes = probabilities.argmax(axis=1)
+        return {
+            'predicted_label': np.asarray(RISK_LABELS, dtype=object)[codes],
+            'predicted_value': codes.astype(float),
+            'p_low_risk': probabilities[:, 0],
+            'p_medium_risk': probabilities[:, 1],
+            'p_high_risk': probabilities[:, 2]
+        }
+
+    def score(self, name, build_matrix, select=has_attendance, classifier=False, on_chunk=None):
+        """Score students with the current `name` model; returns (rows written, model metadata)"""
+        model, meta = self.registry.load(name)
+        if model is None:
+            raise RuntimeError(f"No registered '{name}' model to score with")
+
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            self.ensure_table(connection)
+            feature_version = self.feature_store.version_of(self.feature_store.high_water_marks(connection))
+            scored_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+            placeholders = ','.join('?' * len(PREDICTION_COLUMNS))
+            written = 0
+
+            for chunk in self.feature_store.iter_chunks(self.chunk_size, connection):
+                if select is not None:
+                    chunk = chunk[select(chunk)]
+                if chunk.empty:
+                    continue
+
+                predictions = pd.DataFrame({
+                    'student_id': chunk['student_id'].to_numpy(dtype=np.int64),
+                    'model_name': name,
+                    'model_version': meta['version'],
+                    **self._predict(model, build_matrix(chunk), classifier),
+                    'feature_version': feature_version,
+                    'scored_at': scored_at
+                }, columns=PREDICTION_COLUMNS)
+
+                # Re-scoring the same model version replaces its rows
+                connection.executemany(
+                    f"INSERT OR REPLACE INTO ml_predictions ({','.join(PREDICTION_COLUMNS)}) VALUES ({placeholders})",
+                    predictions.astype(object).where(predictions.notna(), None).itertuples(index=False, name=None)
+                )
+                connection.commit()
+                written += len(predictions)
+
+                if on_chunk is not None:
+                    on_chunk(chunk, predictions)
+
+            return written, meta
+        finally:
+            connection.close()
+
+
+# Registered models scored by the command-line entry point
+SCORING_TARGETS = {
+    'student_risk': (risk_model_matrix, True),
+    'attendance_prediction': (attendance_model_matrix, False)
+}
+
+
+def main(chunk_size=10000):
+    print("=" * 80)
+    print("🌊 STREAMING BATCH SCORING → ml_predictions")
+    print("=" * 80)
+
+    scorer = BatchScorer(chunk_size=chunk_size)
+    for name, (build_matrix, classifier) in SCORING_TARGETS.items():
+        start = time.perf_counter()
+        try:
+            written, meta = scorer.score(name, build_matrix, classifier=classifier)
+        except RuntimeError as e:
+            print(f"⚠️ Skipped {name}: {e} - run complete_ml_suite.py first")
+            continue
+        print(f"✅ {name} v{meta['version']}: {written} predictions stored in {time.perf_counter() - start:.2f}s")
+
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score every student in fixed-size chunks into ml_predictions")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="students per chunk (default: 10000)")
+    args = parser.parse_args()
+    main(chunk_size=args.chunk_size)
@@ -0,0 +1,50 @@
+CHANGE_LOG_SCHEMA = """CREATE TABLE IF NOT EXISTS change_log (
+    table_name TEXT PRIMARY KEY,
+    changes INTEGER NOT NULL DEFAULT 0
+)"""
+
+
+class ChangeTracker:
+    """Per-table high-water marks: max rowid plus a change counter bumped by triggers on every write"""
+
+    def __init__(self, tables):
+        self.tables = tuple(tables)
+
+    def install(self, connection):
+        """Create change_log and the insert/update/delete triggers of every existing tracked table"""
+        existing = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        try:
+            connection.execute(CHANGE_LOG_SCHEMA)
+            for table in self.tables:
+                if table not in existing:
+                    continue
+                connection.execute("INSERT OR IGNORE INTO change_log (table_name) VALUES (?)", (table,))
+                for event in ('INSERT', 'UPDATE', 'DELETE'):
+                    # Triggers also disable SQLite's truncate shortcut, so a bare DELETE FROM still counts
+                    connection.execute(f"""
+                        CREATE TRIGGER IF NOT EXISTS change_log_{table}_{event.lower()}
+                        AFTER {event} ON {table}
+                        BEGIN
+                            UPDATE change_log SET changes = changes + 1 WHERE table_name = '{table}';
+                        END
+                    """)
+            connection.commit()
+        except Exception:
+            # e.g. a read-only connection: don't leave its implicit transaction holding a lock
+            connection.rollback()
+            raise
+
+    def marks(self, connection):
+        """Return {table: (max_rowid, changes)}; tables that do not exist yet read as (0, 0), untracked ones as (max_rowid, 0)"""
+        existing = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        counters = {}
+        if 'change_log' in existing:  # not yet installed, e.g. on a read-only database
+            counters = dict(connection.execute("SELECT table_name, changes FROM change_log").fetchall())
+        marks = {}
+        for table in self.tables:
+            if table in existing:
+                max_rowid = connection.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                marks[table] = (max_rowid, counters.get(table, 0))
+            else:
+                marks[table] = (0, 0)
+        return marks
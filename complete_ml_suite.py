@@ -3,97 +3,215 @@ import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.linear_model import LinearRegression, LogisticRegression
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, mean_squared_error, classification_report
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime, timedelta
 import os
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from feature_store import (StudentFeatureStore, ATTENDANCE_MODEL_FEATURES, RISK_MODEL_FEATURES,
+                           attendance_model_matrix, risk_model_matrix)
+from model_registry import ModelRegistry
+from text_features import KeywordScorer, DIARY_LEXICONS, TOPIC_LEXICONS
+from batch_scoring import BatchScorer, ReportCollector
+from report_writer import write_report, resolve_formats, REPORT_FORMATS
+
+MODEL_STEPS = [
+    ('Model 1', 'model_1_attendance_prediction'),
+    ('Model 2', 'model_2_homework_delay_prediction'),
+    ('Model 3', 'model_3_student_performance_risk'),
+    ('Model 4', 'model_4_lesson_plan_performance')
+]
+
+HOMEWORK_FEATURES = ['days_allowed', 'attendance_rate', 'subject_difficulty']
+LESSON_FEATURES = ['topic_complexity', 'homework_assigned', 'sentiment_score']
+
+def attendance_training_data(store, rng=np.random):
+    """Model 1 students with enough history, their features and simulated next-week attendance"""
+    eligible = store[(store['total_classes'] > 10)
+                     & (store['monday_classes'] > 0)
+                     & (store['friday_classes'] > 0)]
+    
+    # Features: grade_level, monday_attendance_rate, friday_attendance_rate, historical_average
+    features = attendance_model_matrix(eligible)
+    
+    # Target: Next week attendance probability
+    avg_rate = features[:, 3]
+    targets = np.clip(avg_rate + rng.normal(0, 0.05, size=len(avg_rate)), 0.0, 1.0)
+    return eligible, features, targets
+
+def homework_training_data(connection, store, rng=np.random):
+    """Model 2 rows: one simulated submission per (homework, student in its grade/section)"""
+    homework = pd.read_sql_query("""
+        SELECT 
+            h.homework_id,
+            h.grade_id,
+            h.section_id,
+            s.subject_name as subject,
+            julianday(h.due_date) - julianday(h.assigned_date) as days_allowed
+        FROM homework h
+        JOIN teachers t ON h.teacher_id = t.teacher_id
+        JOIN subjects s ON h.subject_id = s.subject_id
+    """, connection)
+    
+    # Per-student attendance rates come from the feature store, computed once for all homework
+    roster = store.loc[store['total_classes'] > 0,
+                       ['student_id', 'student_name', 'grade_id', 'section_id', 'attendance_rate']]
+    
+    # One row per (homework, student in the homework's grade/section)
+    df = homework.merge(roster, on=['grade_id', 'section_id'], how='inner')
+    
+    # Simulate submission delay based on attendance and subject difficulty
+    n = len(df)
+    base_delay = rng.normal(0, 1, size=n)  # Base random delay
+    attendance_factor = (1 - df['attendance_rate'].to_numpy()) * 2  # Poor attendance = more delay
+    subject_factor = np.where(df['subject'].str.contains('Math|Science', regex=True), 1.5, 1.0)
+    
+    predicted_delay = np.maximum(0, base_delay + attendance_factor * subject_factor)
+    actual_delay = np.maximum(0, predicted_delay + rng.normal(0, 0.5, size=n))
+    
+    return df.assign(subject_difficulty=subject_factor,
+                     predicted_delay_days=predicted_delay,
+                     actual_delay_days=actual_delay)
+
+def lesson_training_data(connection, diary_scorer, topic_scorer):
+    """Model 4 rows: one per diary entry with lesson attendance, remark sentiment and topic complexity"""
+    # Analyze class diary entries as proxy for lesson plan effectiveness
+    lesson_data = pd.read_sql_query("""
+        SELECT 
+            cd.diary_id,
+            cd.topic_covered as topic,
+            cd.homework_given,
+            cd.remarks,
+            t.teacher_name as teacher,
+            s.subject_name as subject,
+            g.grade_name as grade,
+            COUNT(a.attendance_id) as students_present,
+            COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as attendance_count
+        FROM class_diary cd
+        JOIN teachers t ON cd.teacher_id = t.teacher_id
+        JOIN subjects s ON cd.subject_id = s.subject_id
+        JOIN grades g ON cd.grade_id = g.grade_id
+        LEFT JOIN attendance a ON a.teacher_id = cd.teacher_id 
+            AND a.subject_id = cd.subject_id 
+            AND DATE(a.attendance_date) = DATE(cd.diary_date)
+        GROUP BY cd.diary_id
+    """, connection)
+    
+    # Calculate lesson effectiveness metrics
+    students = lesson_data['students_present'].to_numpy(dtype=float)
+    present = lesson_data['attendance_count'].to_numpy(dtype=float)
+    attendance_rate = np.divide(present * 100, students, out=np.zeros_like(students), where=students > 0)
+    
+    # Sentiment analysis of remarks and topic complexity, scored over whole columns
+    remark_scores = diary_scorer.score(lesson_data['remarks'])
+    sentiment_score = remark_scores['positive'] - remark_scores['negative']
+    topic_complexity = topic_scorer.score(lesson_data['topic'])['complexity']
+    
+    return lesson_data[['diary_id', 'teacher', 'subject', 'grade', 'topic']].assign(
+        attendance_rate=attendance_rate,
+        sentiment_score=sentiment_score,
+        topic_complexity=topic_complexity,
+        homework_assigned=lesson_data['homework_given'].fillna('').str.strip().ne('').astype(int),
+        lesson_effectiveness_score=attendance_rate + (sentiment_score * 10) - (topic_complexity * 5)
+    )
+
+def risk_training_data(store):
+    """Model 3 features and enhanced risk labels for students with attendance"""
+    features = risk_model_matrix(store)
+    attendance_rate, fee_payment_rate = features[:, 0], features[:, 2]
+    
+    # Enhanced risk classification
+    labels = np.select(
+        [(attendance_rate >= 90) & (fee_payment_rate >= 95),
+         (attendance_rate >= 80) & (fee_payment_rate >= 80)],
+        [0, 1],  # Low Risk, Medium Risk
+        default=2  # High Risk
+    )
+    return features, labels
+
+def _run_model_in_worker(method_name, retrain, forest_jobs, formats):
+    """Process-pool entry point: run one model on its own read-only connection"""
+    ml_suite = ComprehensiveMLSuite(retrain=retrain, forest_jobs=forest_jobs, formats=formats)
+    if not ml_suite.connect_database(read_only=True):
+        return method_name, {}, 0.0, 0.0
+    
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    try:
+        getattr(ml_suite, method_name)()
+    finally:
+        ml_suite.connection.close()  # never leave a read lock behind while Model 3 writes ml_predictions
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+    
+    return method_name, ml_suite.ml_results, wall, cpu
 
 class ComprehensiveMLSuite:
-    def __init__(self):
+    def __init__(self, retrain=False, forest_jobs=None, diary_lexicons=None, topic_lexicons=None, formats=('xlsx',)):
         self.db_path = 'school_management.db'
         self.connection = None
         self.ml_results = {}
-        
-    def connect_database(self):
+        self.timings = {}
+        self.feature_store = StudentFeatureStore(self.db_path)
+        self.registry = ModelRegistry()
+        self.retrain = retrain
+        self.forest_jobs = forest_jobs  # n_jobs for every random forest (None = single core)
+        self.diary_scorer = KeywordScorer(diary_lexicons or DIARY_LEXICONS)
+        self.topic_scorer = KeywordScorer(topic_lexicons or TOPIC_LEXICONS)
+        self.formats = resolve_formats(formats)  # every result file is written once per format
+        
+    def connect_database(self, read_only=False):
         try:
-            self.connection = sqlite3.connect(self.db_path)
+            if read_only:
+                self.connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            else:
+                self.connection = sqlite3.connect(self.db_path)
             print("✅ Connected to database")
             return True
         except Exception as e:
             print(f"❌ Database connection failed: {e}")
             return False
     
+    def _forest(self, estimator_class):
+        return estimator_class(n_estimators=100, random_state=42, n_jobs=self.forest_jobs)
+    
+    def _fit_or_load(self, name, estimator, X, y, feature_names, metric, fingerprint=None):
+        """Load the registered model for `name`, retraining only on request or when its schema or data changed"""
+        return self.registry.fit_or_load(name, estimator, X, y, feature_names, metric, fingerprint=fingerprint,
+                                         retrain=self.retrain)
+    
     def model_1_attendance_prediction(self):
         """Option 1: Student Attendance Prediction Model"""
         print("🎯 Model 1: Student Attendance Prediction...")
         
-        # Get student attendance patterns
-        attendance_data = self.connection.execute("""
-            SELECT 
-                s.student_id,
-                s.student_name,
-                g.grade_level,
-                COUNT(a.attendance_id) as total_classes,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present_count,
-                AVG(CASE WHEN a.status = 'Present' THEN 1 ELSE 0 END) as avg_attendance_rate,
-                COUNT(CASE WHEN strftime('%w', a.attendance_date) = '1' THEN 1 END) as monday_classes,
-                COUNT(CASE WHEN strftime('%w', a.attendance_date) = '1' AND a.status = 'Present' THEN 1 END) as monday_present,
-                COUNT(CASE WHEN strftime('%w', a.attendance_date) = '5' THEN 1 END) as friday_classes,
-                COUNT(CASE WHEN strftime('%w', a.attendance_date) = '5' AND a.status = 'Present' THEN 1 END) as friday_present
-            FROM students s
-            JOIN grades g ON s.grade_id = g.grade_id
-            LEFT JOIN attendance a ON s.student_id = a.student_id
-            GROUP BY s.student_id
-            HAVING total_classes > 10
-        """).fetchall()
-        
-        # Prepare features for attendance prediction
-        features = []
-        targets = []
-        student_names = []
-        
-        for row in attendance_data:
-            student_id, name, grade, total, present, avg_rate, mon_classes, mon_present, fri_classes, fri_present = row
-            
-            if total > 0 and mon_classes > 0 and fri_classes > 0:
-                # Features: grade_level, monday_attendance_rate, friday_attendance_rate, historical_average
-                monday_rate = mon_present / mon_classes if mon_classes > 0 else 0
-                friday_rate = fri_present / fri_classes if fri_classes > 0 else 0
-                
-                features.append([grade, monday_rate, friday_rate, avg_rate])
-                
-                # Target: Next week attendance probability
-                next_week_attendance = min(1.0, max(0.0, avg_rate + np.random.normal(0, 0.05)))
-                targets.append(next_week_attendance)
-                student_names.append(name)
+        # Student attendance patterns from the shared feature store
+        store = self.feature_store.load(self.connection)
+        eligible, features, targets = attendance_training_data(store)
+        student_names = eligible['student_name'].tolist()
         
-        # Train model
-        X = np.array(features)
-        y = np.array(targets)
+        # Train model (targets are simulated, so only the features identify the training data)
+        X = features
+        y = targets
         
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-        
-        model = RandomForestRegressor(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
-        
-        y_pred = model.predict(X_test)
-        mse = mean_squared_error(y_test, y_pred)
+        model, mse = self._fit_or_load(
+            'attendance_prediction', self._forest(RandomForestRegressor), X, y,
+            ATTENDANCE_MODEL_FEATURES, ('mse', mean_squared_error), fingerprint=self.registry.fingerprint(X)
+        )
         
         # Create predictions
         all_predictions = model.predict(X)
         
         results_df = pd.DataFrame({
             'Student_Name': student_names,
-            'Current_Attendance_Rate': [f[3] for f in features],
-            'Monday_Pattern': [f[1] for f in features],
-            'Friday_Pattern': [f[2] for f in features],
+            'Current_Attendance_Rate': features[:, 3],
+            'Monday_Pattern': features[:, 1],
+            'Friday_Pattern': features[:, 2],
             'Predicted_Next_Week_Attendance': all_predictions,
-            'Attendance_Trend': ['Improving' if pred > f[3] else 'Declining' for pred, f in zip(all_predictions, features)]
+            'Attendance_Trend': np.where(all_predictions > features[:, 3], 'Improving', 'Declining')
         })
         
-        results_df.to_excel('ml_model/model1_attendance_predictions.xlsx', index=False)
+        write_report('ml_model/model1_attendance_predictions', {'Sheet1': results_df}, self.formats)
         
         print(f"✅ Model 1 Complete - MSE: {mse:.4f}")
         print(f"📊 Analyzed {len(student_names)} students")
@@ -111,84 +229,37 @@ class ComprehensiveMLSuite:
         print("🎯 Model 2: Homework Submission Delay Prediction...")
         
         # Generate synthetic homework submission data based on existing homework
-        homework_data = self.connection.execute("""
-            SELECT 
-                h.homework_id,
-                h.title,
-                t.teacher_name,
-                s.subject_name,
-                h.assigned_date,
-                h.due_date,
-                julianday(h.due_date) - julianday(h.assigned_date) as days_to_complete
-            FROM homework h
-            JOIN teachers t ON h.teacher_id = t.teacher_id
-            JOIN subjects s ON h.subject_id = s.subject_id
-        """).fetchall()
-        
-        # Simulate student homework submissions
-        submission_records = []
-        
-        for hw_id, title, teacher, subject, assigned, due, days_allowed in homework_data:
-            # Get students for this homework's grade/section
-            students = self.connection.execute("""
-                SELECT s.student_id, s.student_name, 
-                       COUNT(CASE WHEN a.status = 'Present' THEN 1 END) * 1.0 / COUNT(a.attendance_id) as attendance_rate
-                FROM students s
-                LEFT JOIN attendance a ON s.student_id = a.student_id
-                WHERE s.grade_id = (SELECT grade_id FROM homework WHERE homework_id = ?)
-                  AND s.section_id = (SELECT section_id FROM homework WHERE homework_id = ?)
-                GROUP BY s.student_id
-            """, (hw_id, hw_id)).fetchall()
-            
-            for student_id, student_name, attendance_rate in students:
-                # Simulate submission delay based on attendance and subject difficulty
-                base_delay = np.random.normal(0, 1)  # Base random delay
-                attendance_factor = (1 - attendance_rate) * 2  # Poor attendance = more delay
-                subject_factor = 1.5 if 'Math' in subject or 'Science' in subject else 1.0
-                
-                predicted_delay = max(0, base_delay + attendance_factor * subject_factor)
-                actual_delay = max(0, predicted_delay + np.random.normal(0, 0.5))
-                
-                submission_records.append({
-                    'homework_id': hw_id,
-                    'student_name': student_name,
-                    'subject': subject,
-                    'days_allowed': days_allowed,
-                    'attendance_rate': attendance_rate,
-                    'subject_difficulty': subject_factor,
-                    'predicted_delay_days': predicted_delay,
-                    'actual_delay_days': actual_delay
-                })
+        store = self.feature_store.load(self.connection)
+        df = homework_training_data(self.connection, store)
+        df = df[['homework_id', 'student_name', 'subject', 'days_allowed', 'attendance_rate',
+                 'subject_difficulty', 'predicted_delay_days', 'actual_delay_days']]
         
         # Train model
-        if len(submission_records) > 10:
-            df = pd.DataFrame(submission_records)
-            features = ['days_allowed', 'attendance_rate', 'subject_difficulty']
+        if len(df) > 10:
+            features = HOMEWORK_FEATURES
             X = df[features].values
             y = df['actual_delay_days'].values
             
-            X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-            
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-            model.fit(X_train, y_train)
-            
-            y_pred = model.predict(X_test)
-            mse = mean_squared_error(y_test, y_pred)
+            # Delays are simulated, so only the features identify the training data
+            model, mse = self._fit_or_load(
+                'homework_delay', self._forest(RandomForestRegressor), X, y,
+                features, ('mse', mean_squared_error), fingerprint=self.registry.fingerprint(X)
+            )
             
             # Save results
             df['model_predicted_delay'] = model.predict(X)
-            df.to_excel('ml_model/model2_homework_delay_predictions.xlsx', index=False)
+            write_report('ml_model/model2_homework_delay_predictions', {'Sheet1': df}, self.formats)
             
             print(f"✅ Model 2 Complete - MSE: {mse:.4f}")
-            print(f"📊 Analyzed {len(submission_records)} homework submissions")
+            print(f"📊 Analyzed {len(df)} homework submissions")
             
             self.ml_results['Model 2'] = {
                 'type': 'Homework Delay Prediction',
                 'mse': mse,
-                'samples': len(submission_records)
+                'samples': len(df)
             }
             
-            return mse, len(submission_records)
+            return mse, len(df)
         else:
             print("⚠️ Insufficient homework data for Model 2")
             return None, 0
@@ -198,70 +269,36 @@ class ComprehensiveMLSuite:
         print("🎯 Model 3: Student Performance Risk Classification...")
         
         # This is your existing model - let's enhance it
-        ml_data = self.connection.execute("""
-            SELECT 
-                s.student_id,
-                s.student_name,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present_count,
-                COUNT(a.attendance_id) as total_attendance,
-                g.grade_level,
-                COUNT(DISTINCT f.fee_id) as fee_records,
-                SUM(f.paid_amount) as total_fees_paid,
-                SUM(f.amount) as total_fees_due
-            FROM students s
-            LEFT JOIN attendance a ON s.student_id = a.student_id
-            LEFT JOIN grades g ON s.grade_id = g.grade_id
-            LEFT JOIN fees f ON s.student_id = f.student_id
-            GROUP BY s.student_id, s.student_name, g.grade_level
-        """).fetchall()
-        
-        features = []
-        labels = []
-        student_names = []
-        
-        for student_id, name, present, total, grade_level, fee_records, fees_paid, fees_due in ml_data:
-            if total > 0:
-                attendance_rate = (present / total) * 100
-                fee_payment_rate = (fees_paid / fees_due) * 100 if fees_due > 0 else 100
-                
-                features.append([attendance_rate, grade_level, fee_payment_rate])
-                
-                # Enhanced risk classification
-                if attendance_rate >= 90 and fee_payment_rate >= 95:
-                    label = 0  # Low Risk
-                elif attendance_rate >= 80 and fee_payment_rate >= 80:
-                    label = 1  # Medium Risk
-                else:
-                    label = 2  # High Risk
-                
-                labels.append(label)
-                student_names.append(name)
-        
-        X = np.array(features)
-        y = np.array(labels)
-        
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-        
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
-        
-        y_pred = model.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
-        
-        # Enhanced results
-        all_predictions = model.predict(X)
-        risk_labels = ['Low Risk', 'Medium Risk', 'High Risk']
-        
-        results_df = pd.DataFrame({
-            'Student_Name': student_names,
-            'Attendance_Rate': [f[0] for f in features],
-            'Grade_Level': [f[1] for f in features],
-            'Fee_Payment_Rate': [f[2] for f in features],
-            'Risk_Category': [risk_labels[pred] for pred in all_predictions],
-            'Intervention_Priority': ['High' if pred == 2 else 'Medium' if pred == 1 else 'Low' for pred in all_predictions]
-        })
-        
-        results_df.to_excel('ml_model/model3_enhanced_risk_predictions.xlsx', index=False)
+        store = self.feature_store.load(self.connection)
+        store = store[store['total_classes'] > 0]
+        
+        features, labels = risk_training_data(store)
+        X = features
+        y = labels
+        
+        model, accuracy = self._fit_or_load(
+            'student_risk', self._forest(RandomForestClassifier), X, y,
+            RISK_MODEL_FEATURES, ('accuracy', accuracy_score)
+        )
+        
+        # Enhanced results: stream every student through the model into ml_predictions
+        priorities = np.array(['Low', 'Medium', 'High'], dtype=object)
+        report = ReportCollector(lambda chunk, predictions: pd.DataFrame({
+            'Student_Name': chunk['student_name'].to_numpy(),
+            'Attendance_Rate': chunk['attendance_rate'].to_numpy(dtype=float) * 100,
+            'Grade_Level': chunk['grade_level'].to_numpy(dtype=float),
+            'Fee_Payment_Rate': chunk['fee_payment_rate'].to_numpy(dtype=float) * 100,
+            'Risk_Category': predictions['predicted_label'].to_numpy(),
+            'Intervention_Priority': priorities[predictions['predicted_value'].to_numpy(dtype=np.int64)]
+        }))
+        scored, meta = BatchScorer(self.db_path, self.registry, self.feature_store).score(
+            'student_risk', risk_model_matrix, classifier=True, on_chunk=report
+        )
+        
+        write_report('ml_model/model3_enhanced_risk_predictions', {'Sheet1': report.frame()}, self.formats)
+        print(f"🗄️ {scored} risk predictions stored in ml_predictions (student_risk v{meta['version']})")
+        if report.truncated:
+            print(f"⚠️ Excel report limited to the first {report.rows} students")
         
         print(f"✅ Model 3 Enhanced - Accuracy: {accuracy:.2f}")
         print(f"📊 Analyzed {len(features)} students")
@@ -278,79 +315,19 @@ class ComprehensiveMLSuite:
         """Option 4: Lesson Plan Performance Correlation Analysis"""
         print("🎯 Model 4: Lesson Plan Performance Correlation...")
         
-        # Analyze class diary entries as proxy for lesson plan effectiveness
-        lesson_data = self.connection.execute("""
-            SELECT 
-                cd.diary_id,
-                cd.topic_covered,
-                cd.homework_given,
-                cd.remarks,
-                t.teacher_name,
-                s.subject_name,
-                g.grade_name,
-                COUNT(a.attendance_id) as students_present,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as attendance_count
-            FROM class_diary cd
-            JOIN teachers t ON cd.teacher_id = t.teacher_id
-            JOIN subjects s ON cd.subject_id = s.subject_id
-            JOIN grades g ON cd.grade_id = g.grade_id
-            LEFT JOIN attendance a ON a.teacher_id = cd.teacher_id 
-                AND a.subject_id = cd.subject_id 
-                AND DATE(a.attendance_date) = DATE(cd.diary_date)
-            GROUP BY cd.diary_id
-        """).fetchall()
-        
-        # Create lesson effectiveness scores
-        lesson_performance = []
-        
-        for row in lesson_data:
-            diary_id, topic, homework, remarks, teacher, subject, grade, students, present = row
-            
-            # Calculate lesson effectiveness metrics
-            attendance_rate = (present / students * 100) if students > 0 else 0
-            
-            # Sentiment analysis of remarks (simplified)
-            positive_words = ['good', 'excellent', 'understanding', 'participated', 'active', 'engaged']
-            negative_words = ['poor', 'need', 'difficult', 'confused', 'absent', 'distracted']
-            
-            remarks_lower = remarks.lower() if remarks else ""
-            positive_score = sum(1 for word in positive_words if word in remarks_lower)
-            negative_score = sum(1 for word in negative_words if word in remarks_lower)
-            sentiment_score = positive_score - negative_score
-            
-            # Topic complexity (based on keywords)
-            complex_topics = ['advanced', 'complex', 'difficult', 'algebra', 'geometry', 'calculus']
-            topic_complexity = sum(1 for word in complex_topics if word.lower() in topic.lower())
-            
-            lesson_performance.append({
-                'diary_id': diary_id,
-                'teacher': teacher,
-                'subject': subject,
-                'grade': grade,
-                'topic': topic,
-                'attendance_rate': attendance_rate,
-                'sentiment_score': sentiment_score,
-                'topic_complexity': topic_complexity,
-                'homework_assigned': 1 if homework and homework.strip() else 0,
-                'lesson_effectiveness_score': attendance_rate + (sentiment_score * 10) - (topic_complexity * 5)
-            })
-        
-        if len(lesson_performance) > 5:
-            df = pd.DataFrame(lesson_performance)
-            
+        df = lesson_training_data(self.connection, self.diary_scorer, self.topic_scorer)
+        
+        if len(df) > 5:
             # Features for lesson plan effectiveness prediction
-            features = ['topic_complexity', 'homework_assigned', 'sentiment_score']
+            features = LESSON_FEATURES
             X = df[features].values
             y = df['lesson_effectiveness_score'].values
             
             if len(X) > 5:
-                X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
-                
-                model = RandomForestRegressor(n_estimators=100, random_state=42)
-                model.fit(X_train, y_train)
-                
-                y_pred = model.predict(X_test)
-                mse = mean_squared_error(y_test, y_pred)
+                model, mse = self._fit_or_load(
+                    'lesson_plan_performance', self._forest(RandomForestRegressor), X, y,
+                    features, ('mse', mean_squared_error)
+                )
                 
                 # Feature importance
                 feature_importance = pd.DataFrame({
@@ -361,24 +338,64 @@ class ComprehensiveMLSuite:
                 df['predicted_effectiveness'] = model.predict(X)
                 
                 # Save results
-                with pd.ExcelWriter('ml_model/model4_lesson_plan_analysis.xlsx') as writer:
-                    df.to_excel(writer, sheet_name='Lesson_Analysis', index=False)
-                    feature_importance.to_excel(writer, sheet_name='Feature_Importance', index=False)
+                write_report('ml_model/model4_lesson_plan_analysis',
+                             {'Lesson_Analysis': df, 'Feature_Importance': feature_importance}, self.formats)
                 
                 print(f"✅ Model 4 Complete - MSE: {mse:.4f}")
-                print(f"📊 Analyzed {len(lesson_performance)} lesson plans")
+                print(f"📊 Analyzed {len(df)} lesson plans")
                 
                 self.ml_results['Model 4'] = {
                     'type': 'Lesson Plan Performance',
                     'mse': mse,
-                    'samples': len(lesson_performance)
+                    'samples': len(df)
                 }
                 
-                return mse, len(lesson_performance)
+                return mse, len(df)
         
         print("⚠️ Insufficient lesson plan data for Model 4")
         return None, 0
     
+    def run_all_models(self, parallel=False, workers=None):
+        """Run the 4 models back to back, or concurrently in a process pool"""
+        if not parallel:
+            for model_name, method_name in MODEL_STEPS:
+                wall_start, cpu_start = time.perf_counter(), time.process_time()
+                getattr(self, method_name)()
+                self.timings[model_name] = (time.perf_counter() - wall_start, time.process_time() - cpu_start)
+            self._print_timings()
+            return self.ml_results
+        
+        workers = workers or len(MODEL_STEPS)
+        if self.forest_jobs is None:
+            self.forest_jobs = max(1, (os.cpu_count() or 1) // workers)
+        print(f"⚙️ Training {len(MODEL_STEPS)} models on {workers} processes ({self.forest_jobs} cores per forest)")
+        
+        # Build the shared feature cache once so workers only read it
+        self.feature_store.load(self.connection)
+        
+        wall_start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_model_in_worker, method_name, self.retrain, self.forest_jobs, self.formats)
+                       for _, method_name in MODEL_STEPS]
+            results = {method_name: (results, wall, cpu)
+                       for method_name, results, wall, cpu in (future.result() for future in futures)}
+        total_wall = time.perf_counter() - wall_start
+        
+        for model_name, method_name in MODEL_STEPS:
+            worker_results, wall, cpu = results[method_name]
+            self.ml_results.update(worker_results)
+            self.timings[model_name] = (wall, cpu)
+        self._print_timings(total_wall)
+        return self.ml_results
+    
+    def _print_timings(self, total_wall=None):
+        print("\n⏱️ Model timings:")
+        for model_name, (wall, cpu) in self.timings.items():
+            print(f"  {model_name}: wall {wall:.2f}s, CPU {cpu:.2f}s")
+        if total_wall is not None:
+            print(f"  Total wall clock: {total_wall:.2f}s "
+                  f"(sum of model wall times {sum(w for w, _ in self.timings.values()):.2f}s)")
+    
     def generate_comprehensive_ml_report(self):
         """Generate comprehensive ML suite report"""
         print("📊 Generating Comprehensive ML Report...")
@@ -414,19 +431,19 @@ class ComprehensiveMLSuite:
             summary_data['Business_Value'].append(business_values.get(model_name, 'Analytics and insights'))
         
         summary_df = pd.DataFrame(summary_data)
-        summary_df.to_excel('ml_model/comprehensive_ml_suite_report.xlsx', index=False)
+        write_report('ml_model/comprehensive_ml_suite_report', {'Sheet1': summary_df}, self.formats)
         
         print(f"✅ Comprehensive ML Report Generated")
         print(f"📁 Total ML Models: {len(self.ml_results)}")
         
         return summary_df
 
-def main():
+def main(retrain=False, parallel=False, workers=None, forest_jobs=None, formats=('xlsx',)):
     print("=" * 80)
     print("🤖 COMPREHENSIVE ML SUITE - ALL 4 MODELS")
     print("=" * 80)
     
-    ml_suite = ComprehensiveMLSuite()
+    ml_suite = ComprehensiveMLSuite(retrain=retrain, forest_jobs=forest_jobs, formats=formats)
     
     if not ml_suite.connect_database():
         return False
@@ -437,10 +454,7 @@ def main():
     print("🚀 Implementing ALL 4 ML Model Options...")
     
     # Run all 4 models
-    ml_suite.model_1_attendance_prediction()
-    ml_suite.model_2_homework_delay_prediction()  
-    ml_suite.model_3_student_performance_risk()
-    ml_suite.model_4_lesson_plan_performance()
+    ml_suite.run_all_models(parallel=parallel, workers=workers)
     
     # Generate comprehensive report
     summary_df = ml_suite.generate_comprehensive_ml_report()
@@ -460,4 +474,17 @@ def main():
     return True
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Run all 4 ML models")
+    parser.add_argument('--retrain', action='store_true',
+                        help="retrain every model instead of scoring with the registered version")
+    parser.add_argument('--parallel', action='store_true',
+                        help="train the independent models concurrently in a process pool")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for --parallel (default: one per model)")
+    parser.add_argument('--forest-jobs', type=int, default=None,
+                        help="cores per random forest (default: 1, or an even share of the CPUs with --parallel)")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=['xlsx'],
+                        help="result file formats (default: xlsx; parquet needs pyarrow)")
+    args = parser.parse_args()
+    main(retrain=args.retrain, parallel=args.parallel, workers=args.workers, forest_jobs=args.forest_jobs,
+         formats=args.formats)
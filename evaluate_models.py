@@ -0,0 +1,195 @@
+import os
+import time
+import pickle
+import hashlib
+import sqlite3
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.metrics import accuracy_score, f1_score, mean_squared_error, r2_score
+from feature_store import StudentFeatureStore
+from model_registry import ModelRegistry
+from text_features import KeywordScorer, DIARY_LEXICONS, TOPIC_LEXICONS
+from report_writer import write_report, resolve_formats, REPORT_FORMATS
+from complete_ml_suite import (attendance_training_data, homework_training_data, lesson_training_data,
+                               risk_training_data, HOMEWORK_FEATURES, LESSON_FEATURES)
+
+# Model -> (registry name, estimator class, primary metric)
+EVALUATION_TARGETS = {
+    'Model 1': ('attendance_prediction', RandomForestRegressor, 'mse'),
+    'Model 2': ('homework_delay', RandomForestRegressor, 'mse'),
+    'Model 3': ('student_risk', RandomForestClassifier, 'accuracy'),
+    'Model 4': ('lesson_plan_performance', RandomForestRegressor, 'mse')
+}
+
+
+def _evaluate_fold(estimator, metric, X_train, y_train, X_test, y_test):
+    """Process-pool job: fit one fold and score it on the held-out rows"""
+    estimator.fit(X_train, y_train)
+    predicted = estimator.predict(X_test)
+    if metric == 'accuracy':
+        scores = {'accuracy': accuracy_score(y_test, predicted),
+                  'f1_macro': f1_score(y_test, predicted, average='macro', zero_division=0)}
+    else:
+        scores = {'mse': mean_squared_error(y_test, predicted),
+                  'r2': r2_score(y_test, predicted) if len(y_test) > 1 else float('nan')}
+    return estimator, scores
+
+
+class ModelEvaluator:
+    """k-fold cross-validation of models 1-4 with every fitted fold cached on disk"""
+
+    def __init__(self, db_path='school_management.db', cache_dir='ml_model/cache/evaluation', n_folds=5,
+                 workers=None, seed=42):
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.n_folds = n_folds
+        self.workers = workers
+        self.seed = seed  # simulated targets (models 1 and 2) are drawn from this seed so folds stay comparable
+        self.registry = ModelRegistry()
+        self.feature_store = StudentFeatureStore(db_path)
+
+    def load_data(self, labels):
+        """Return ({model: (row keys, X, y)}, feature-store version)"""
+        connection = sqlite3.connect(self.db_path)
+        try:
+            store = self.feature_store.load(connection)
+            data = {}
+            for label in labels:
+                rng = np.random.default_rng(self.seed)
+                if label == 'Model 1':
+                    eligible, X, y = attendance_training_data(store, rng=rng)
+                    keys = eligible['student_id'].to_numpy()
+                elif label == 'Model 2':
+                    df = homework_training_data(connection, store, rng=rng)
+                    keys = df['homework_id'].to_numpy() * 2 ** 32 + df['student_id'].to_numpy()
+                    X, y = df[HOMEWORK_FEATURES].values, df['actual_delay_days'].values
+                elif label == 'Model 3':
+                    students = store[store['total_classes'] > 0]
+                    X, y = risk_training_data(students)
+                    keys = students['student_id'].to_numpy()
+                else:
+                    df = lesson_training_data(connection, KeywordScorer(DIARY_LEXICONS), KeywordScorer(TOPIC_LEXICONS))
+                    keys = df['diary_id'].to_numpy()
+                    X, y = df[LESSON_FEATURES].values, df['lesson_effectiveness_score'].values
+                data[label] = (np.asarray(keys, dtype=np.int64), X, y)
+            return data, self.feature_store.version
+        finally:
+            connection.close()
+
+    def fold_ids(self, keys):
+        """Fold of every row from a hash of its key, so appended rows never reshuffle existing folds"""
+        mixed = keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        mixed ^= mixed >> np.uint64(29)
+        return (mixed % np.uint64(self.n_folds)).astype(np.int64)
+
+    def _estimator(self, name, estimator_class):
+        estimator = estimator_class(n_estimators=100, random_state=42)
+        estimator.set_params(**self.registry.tuned_params(name))
+        return estimator
+
+    def _cache_path(self, name, estimator, X_train, y_train, X_test, y_test):
+        """Cache file of one fold, keyed on the estimator settings and the exact fold data"""
+        params = repr(sorted(estimator.get_params().items()))
+        payload = '|'.join([name, params, self.registry.fingerprint(X_train, y_train),
+                            self.registry.fingerprint(X_test, y_test)])
+        key = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.cache_dir, name, f"{key}.pkl")
+
+    def evaluate(self, labels=None):
+        """Cross-validate the given models (all by default); returns the comparison DataFrame"""
+        labels = labels or list(EVALUATION_TARGETS)
+        data, feature_version = self.load_data(labels)
+
+        jobs, fold_scores, counts = [], {label: [] for label in labels}, {}
+        for label in labels:
+            name, estimator_class, metric = EVALUATION_TARGETS[label]
+            keys, X, y = data[label]
+            folds = self.fold_ids(keys)
+            fitted = cached = 0
+            for fold in range(self.n_folds):
+                test = folds == fold
+                if not test.any() or test.all():
+                    continue
+                estimator = self._estimator(name, estimator_class)
+                arrays = (X[~test], y[~test], X[test], y[test])
+                path = self._cache_path(name, estimator, *arrays)
+                if os.path.exists(path):
+                    with open(path, 'rb') as file:
+                        fold_scores[label].append(pickle.load(file)['scores'])
+                    cached += 1
+                else:
+                    jobs.append((label, path, estimator, metric, arrays))
+                    fitted += 1
+            counts[label] = (fitted, cached)
+
+        if jobs:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = [(label, path, pool.submit(_evaluate_fold, estimator, metric, *arrays))
+                           for label, path, estimator, metric, arrays in jobs]
+                for label, path, future in futures:
+                    model, scores = future.result()
+                    fold_scores[label].append(scores)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    with open(f"{path}.tmp", 'wb') as file:
+                        pickle.dump({'model': model, 'scores': scores, 'feature_version': feature_version}, file)
+                    os.replace(f"{path}.tmp", path)
+
+        rows = []
+        for label in labels:
+            name, _, metric = EVALUATION_TARGETS[label]
+            scores = pd.DataFrame(fold_scores[label])
+            secondary = 'f1_macro' if metric == 'accuracy' else 'r2'
+            registered = self.registry.current(name)
+            fitted, cached = counts[label]
+            rows.append({
+                'Model': label,
+                'Registry_Name': name,
+                'Metric': metric,
+                'CV_Mean': scores[metric].mean() if len(scores) else np.nan,
+                'CV_Std': scores[metric].std(ddof=0) if len(scores) else np.nan,
+                'Secondary_Metric': secondary,
+                'Secondary_Mean': scores[secondary].mean() if len(scores) else np.nan,
+                'Registered_Holdout': registered['metrics'].get(metric) if registered else np.nan,
+                'Samples': len(data[label][0]),
+                'Folds': len(scores),
+                'Folds_Fitted': fitted,
+                'Folds_Cached': cached,
+                'Feature_Version': feature_version
+            })
+        return pd.DataFrame(rows)
+
+
+def main(n_folds=5, workers=None, labels=None, formats=('xlsx',)):
+    print("=" * 80)
+    print(f"📐 CROSS-VALIDATED MODEL EVALUATION ({n_folds}-fold)")
+    print("=" * 80)
+
+    start = time.perf_counter()
+    comparison = ModelEvaluator(n_folds=n_folds, workers=workers).evaluate(labels)
+    elapsed = time.perf_counter() - start
+
+    for row in comparison.itertuples(index=False):
+        print(f"  🎯 {row.Model} ({row.Registry_Name}): {row.Metric} {row.CV_Mean:.4f} ± {row.CV_Std:.4f}, "
+              f"{row.Secondary_Metric} {row.Secondary_Mean:.3f} on {row.Samples} samples "
+              f"({row.Folds_Fitted} folds fitted, {row.Folds_Cached} from cache)")
+
+    os.makedirs('ml_model', exist_ok=True)
+    saved = write_report('ml_model/model_evaluation', {'Sheet1': comparison}, resolve_formats(formats))
+    print(f"✅ Evaluation finished in {elapsed:.2f}s")
+    print(f"📁 Comparison saved: {', '.join(saved)}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="k-fold cross-validation of the four ML models")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all CPUs)")
+    parser.add_argument('--models', nargs='*', choices=list(EVALUATION_TARGETS), default=None,
+                        metavar='MODEL', help="subset to evaluate, e.g. --models 'Model 1' 'Model 3'")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=['xlsx'],
+                        help="comparison file formats (default: xlsx; parquet needs pyarrow)")
+    args = parser.parse_args()
+    main(n_folds=args.folds, workers=args.workers, labels=args.models, formats=args.formats)
@@ -0,0 +1,379 @@
+import sqlite3
+import pickle
+import hashlib
+import struct
+import os
+from datetime import date
+from collections import Counter
+from itertools import compress
+import pandas as pd
+import numpy as np
+from change_tracking import ChangeTracker
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']
+ROLLING_WINDOWS = (7, 14, 30)
+
+FEATURE_COLUMNS = [
+    'student_id', 'student_name', 'grade_id', 'section_id', 'grade_level',
+    'total_classes', 'present_count', 'attendance_rate',
+    *[f'rate_{window}d' for window in ROLLING_WINDOWS], 'absence_streak', 'trend_slope',
+    *[f'{day}_{kind}' for day in WEEKDAYS for kind in ('classes', 'present', 'rate')],
+    'fee_records', 'fees_paid', 'fees_due', 'fee_payment_rate',
+    'homework_count', 'avg_homework_days', 'diary_entries'
+]
+
+ATTENDANCE_MODEL_FEATURES = ['grade_level', 'monday_rate', 'friday_rate', 'attendance_rate',
+                             'rate_7d', 'rate_30d', 'absence_streak', 'trend_slope']
+RISK_MODEL_FEATURES = ['attendance_rate', 'grade_level', 'fee_payment_rate',
+                       'rate_14d', 'absence_streak', 'trend_slope']
+
+
+def attendance_model_matrix(frame):
+    """Model 1 inputs: grade level, Monday/Friday presence rates, historical average and rolling trends"""
+    return frame[ATTENDANCE_MODEL_FEATURES].to_numpy(dtype=float)
+
+
+def risk_model_matrix(frame):
+    """Model 3 inputs: attendance %, grade level, fee payment %, then recent attendance and trend"""
+    return np.column_stack([
+        frame['attendance_rate'].to_numpy(dtype=float) * 100,
+        frame['grade_level'].to_numpy(dtype=float),
+        frame['fee_payment_rate'].to_numpy(dtype=float) * 100,
+        frame['rate_14d'].to_numpy(dtype=float) * 100,
+        frame['absence_streak'].to_numpy(dtype=float),
+        frame['trend_slope'].to_numpy(dtype=float)
+    ])
+
+
+ATTENDANCE_PROFILE_COLUMNS = [
+    'total_classes', 'present_count', 'attendance_rate',
+    *[f'{day}_{kind}' for day in WEEKDAYS for kind in ('classes', 'present', 'rate')],
+    *[f'rate_{window}d' for window in ROLLING_WINDOWS], 'absence_streak', 'trend_slope'
+]
+
+
+class AttendanceProfile:
+    """SQLite aggregate: one student's attendance rows -> packed float64 vector of ATTENDANCE_PROFILE_COLUMNS"""
+
+    _packer = struct.Struct(f'<{len(ATTENDANCE_PROFILE_COLUMNS)}d')
+    _calendar = {}  # 'YYYY-MM-DD' -> (ordinal, weekday), shared across groups since dates repeat
+
+    def __init__(self):
+        self.rows = []
+
+    def step(self, attendance_id, attendance_date, status):
+        self.rows.append((attendance_date, attendance_id, status == 'Present'))
+
+    @classmethod
+    def _day(cls, text):
+        day = cls._calendar.get(text)
+        if day is None:
+            parsed = date.fromisoformat(text)
+            day = cls._calendar[text] = (parsed.toordinal(), parsed.weekday())
+        return day
+
+    def finalize(self):
+        # Per-row work stays in C builtins (sort, Counter, compress); the Python loop runs once per class day
+        rows = sorted(self.rows)  # ISO dates sort chronologically, ties by attendance_id
+        days = [text for text, _, _ in rows]
+        flags = [present for _, _, present in rows]
+        total, hits = len(rows), sum(flags)
+        streak = flags[::-1].index(True) if hits else total  # consecutive absences since the last class attended
+
+        day_total = Counter(days)  # in date order
+        day_hits = Counter(compress(days, flags))
+        last_day = self._day(days[-1])[0]
+        day_classes, day_present = [0] * 7, [0] * 7
+        window_classes, window_hits = [0] * len(ROLLING_WINDOWS), [0] * len(ROLLING_WINDOWS)
+        n = float(len(day_total))
+        sum_t = sum_r = sum_tt = sum_tr = 0.0
+
+        for text, classes in day_total.items():
+            ordinal, weekday = self._day(text)
+            present = day_hits[text]
+            day_classes[weekday] += classes
+            day_present[weekday] += present
+            # Windows end at the student's own latest record, so values only move when that student's rows change
+            age = last_day - ordinal
+            for index, window in enumerate(ROLLING_WINDOWS):
+                if age < window:
+                    window_classes[index] += classes
+                    window_hits[index] += present
+            # Sums for the least-squares slope of the daily presence rate (change per day)
+            t, r = float(-age), present / classes
+            sum_t += t
+            sum_r += r
+            sum_tt += t * t
+            sum_tr += t * r
+
+        denominator = n * sum_tt - sum_t ** 2
+        slope = (n * sum_tr - sum_t * sum_r) / denominator if denominator > 0 else 0.0
+
+        values = [total, hits, hits / total]
+        for weekday in range(len(WEEKDAYS)):
+            classes = day_classes[weekday]
+            values += [classes, day_present[weekday], day_present[weekday] / classes if classes else 0.0]
+        values += [hits_ / classes for hits_, classes in zip(window_hits, window_classes)]
+        values += [streak, slope]
+        return self._packer.pack(*values)
+
+
+class StudentFeatureStore:
+    """Cached, versioned per-student feature matrix shared by all ML models"""
+
+    SOURCE_TABLES = ('students', 'grades', 'attendance', 'fees', 'homework', 'class_diary')
+    INDEXES = (
+        "CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance(student_id)",
+        "CREATE INDEX IF NOT EXISTS idx_fees_student ON fees(student_id)",
+    )
+
+    def __init__(self, db_path='school_management.db', cache_path='ml_model/cache/student_features.pkl'):
+        self.db_path = db_path
+        self.cache_path = cache_path
+        self.features = None
+        self.marks = None
+        self.tracker = ChangeTracker(self.SOURCE_TABLES)
+
+    def high_water_marks(self, connection):
+        """Return {table: (max_rowid, row_count, changes)} for every source table
+
+        changes is the change_log counter bumped by every insert, update and delete, so in-place
+        updates move the marks too.
+        """
+        counters = self.tracker.marks(connection)
+        marks = {}
+        for table in self.SOURCE_TABLES:
+            max_rowid, count = connection.execute(
+                f"SELECT COALESCE(MAX(rowid), 0), COUNT(*) FROM {table}"
+            ).fetchone()
+            marks[table] = (max_rowid, count, counters[table][1])
+        return marks
+
+    def ensure_indexes(self, connection):
+        """Create the student_id indexes and change counters used for refreshes (skipped on read-only databases)"""
+        try:
+            for statement in self.INDEXES:
+                connection.execute(statement)
+            connection.commit()
+            self.tracker.install(connection)
+        except sqlite3.OperationalError:
+            connection.rollback()  # an open read transaction would block every writer until this connection closes
+
+    @staticmethod
+    def version_of(marks):
+        """Short stable fingerprint of a set of high-water marks"""
+        payload = repr(sorted(marks.items())).encode('utf-8')
+        return hashlib.sha1(payload).hexdigest()[:12]
+
+    @property
+    def version(self):
+        return self.version_of(self.marks) if self.marks else None
+
+    def load(self, connection=None, force=False):
+        """Return the feature matrix, recomputing only what changed since the cached build"""
+        own_connection = connection is None
+        if own_connection:
+            connection = sqlite3.connect(self.db_path)
+
+        try:
+            self.ensure_indexes(connection)
+            marks = self.high_water_marks(connection)
+
+            if self.features is None and not force:
+                self._read_cache()
+
+            if force or self.features is None or self.marks is None:
+                self.features = self._compute(connection)
+                print(f"🧮 Feature store rebuilt: {len(self.features)} students")
+            elif marks != self.marks:
+                changed = self._changed_students(connection, self.marks, marks)
+                if changed is None:
+                    self.features = self._compute(connection)
+                    print(f"🧮 Feature store rebuilt: {len(self.features)} students")
+                elif changed:
+                    fresh = self._compute(connection, changed)
+                    kept = self.features[~self.features['student_id'].isin(changed)]
+                    self.features = (pd.concat([kept, fresh], ignore_index=True)
+                                     .sort_values('student_id', ignore_index=True))
+                    print(f"🧮 Feature store refreshed: {len(changed)} changed students")
+            else:
+                return self.features
+
+            self.marks = marks
+            self._write_cache()
+            return self.features
+        finally:
+            if own_connection:
+                connection.close()
+
+    def iter_chunks(self, chunk_size=10000, connection=None):
+        """Yield feature rows in student_id order, at most `chunk_size` students at a time"""
+        own_connection = connection is None
+        if own_connection:
+            connection = sqlite3.connect(self.db_path)
+
+        try:
+            # An up-to-date in-memory matrix is sliced; otherwise each chunk is computed on its own
+            if self.features is not None and self.marks == self.high_water_marks(connection):
+                for start in range(0, len(self.features), chunk_size):
+                    yield self.features.iloc[start:start + chunk_size]
+                return
+
+            self.ensure_indexes(connection)
+            last_id = 0  # student_id is an AUTOINCREMENT rowid, so keyset paging walks the table once
+            while True:
+                rows = connection.execute(
+                    "SELECT student_id FROM students WHERE student_id > ? ORDER BY student_id LIMIT ?",
+                    (last_id, chunk_size)
+                ).fetchall()
+                if not rows:
+                    return
+                student_ids = [student_id for student_id, in rows]
+                yield self._compute(connection, student_ids)
+                last_id = student_ids[-1]
+        finally:
+            if own_connection:
+                connection.close()
+
+    def _read_cache(self):
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'rb') as file:
+                cached = pickle.load(file)
+            # Caches from before update tracking hold (max_rowid, row_count) marks and are rebuilt
+            if (list(cached['features'].columns) == FEATURE_COLUMNS
+                    and all(len(mark) == 3 for mark in cached['marks'].values())):
+                self.features = cached['features']
+                self.marks = cached['marks']
+        except Exception as e:
+            print(f"⚠️ Ignoring unreadable feature cache: {e}")
+
+    def _write_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        tmp_path = f"{self.cache_path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            pickle.dump({'marks': self.marks, 'features': self.features}, file)
+        os.replace(tmp_path, self.cache_path)
+
+    def _changed_students(self, connection, old, new):
+        """Student ids touched by rows appended since `old`, or None when a full rebuild is needed"""
+        for table, (old_max, old_count, old_changes) in old.items():
+            new_max, new_count, new_changes = new.get(table, (0, 0, 0))
+            if new_max < old_max or new_count < old_count:
+                return None  # rows were deleted
+            appended = connection.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE rowid > ?", (old_max,)
+            ).fetchone()[0]
+            if old_count + appended != new_count:
+                return None  # rows were removed and replaced
+            if new_changes != old_changes and new_changes - old_changes != appended:
+                return None  # rows were updated (or deleted) in place
+        if new['grades'] != old['grades']:
+            return None
+
+        changed = set()
+        for table in ('students', 'attendance', 'fees'):
+            rows = connection.execute(
+                f"SELECT DISTINCT student_id FROM {table} WHERE rowid > ?", (old[table][0],)
+            ).fetchall()
+            changed.update(student_id for student_id, in rows)
+
+        # Homework and diary entries belong to a whole grade/section
+        for table in ('homework', 'class_diary'):
+            rows = connection.execute(f"""
+                SELECT DISTINCT s.student_id
+                FROM {table} x
+                JOIN students s ON s.grade_id = x.grade_id AND s.section_id = x.section_id
+                WHERE x.rowid > ?
+            """, (old[table][0],)).fetchall()
+            changed.update(student_id for student_id, in rows)
+
+        return sorted(changed)
+
+    def _compute(self, connection, student_ids=None):
+        """Build feature rows for `student_ids` (all students when None)"""
+        if student_ids is not None:
+            connection.execute("CREATE TEMP TABLE IF NOT EXISTS fs_scope (student_id INTEGER PRIMARY KEY)")
+            connection.execute("DELETE FROM fs_scope")
+            connection.executemany("INSERT INTO fs_scope VALUES (?)", [(i,) for i in student_ids])
+            scope = "WHERE student_id IN (SELECT student_id FROM fs_scope)"
+            student_scope = "WHERE s.student_id IN (SELECT student_id FROM fs_scope)"
+        else:
+            scope = student_scope = ""
+
+        students = pd.read_sql_query(f"""
+            SELECT s.student_id, s.student_name, s.grade_id, s.section_id, g.grade_level
+            FROM students s
+            LEFT JOIN grades g ON s.grade_id = g.grade_id
+            {student_scope}
+            ORDER BY s.student_id
+        """, connection)
+
+        # One scan of attendance, grouped along idx_attendance_student, yields every attendance feature
+        connection.create_aggregate('attendance_profile', 3, AttendanceProfile)
+        profiles = connection.execute(f"""
+            SELECT student_id, attendance_profile(attendance_id, substr(attendance_date, 1, 10), status)
+            FROM attendance {scope}
+            GROUP BY student_id
+        """).fetchall()
+        fees = pd.read_sql_query(
+            f"SELECT student_id, amount, paid_amount FROM fees {scope}", connection
+        )
+        homework = pd.read_sql_query("""
+            SELECT grade_id, section_id,
+                   COUNT(*) as homework_count,
+                   AVG(julianday(due_date) - julianday(assigned_date)) as avg_homework_days
+            FROM homework
+            GROUP BY grade_id, section_id
+        """, connection)
+        diary = pd.read_sql_query("""
+            SELECT grade_id, section_id, COUNT(*) as diary_entries
+            FROM class_diary
+            GROUP BY grade_id, section_id
+        """, connection)
+
+        if student_ids is not None:
+            connection.execute("DELETE FROM fs_scope")
+            # The fs_scope writes opened a transaction whose read lock would block other connections' commits
+            connection.commit()
+
+        df = students.set_index('student_id')
+        df = df.join(self._attendance_features(profiles))
+        df = df.join(self._fee_features(fees))
+        df = df.reset_index()
+        df = df.merge(homework, on=['grade_id', 'section_id'], how='left')
+        df = df.merge(diary, on=['grade_id', 'section_id'], how='left')
+
+        count_columns = ['total_classes', 'present_count', 'absence_streak',
+                         'fee_records', 'homework_count', 'diary_entries']
+        count_columns += [f'{day}_{kind}' for day in WEEKDAYS for kind in ('classes', 'present')]
+        df[count_columns] = df[count_columns].fillna(0).astype(np.int64)
+        rate_columns = ['attendance_rate', 'trend_slope', 'fees_paid', 'fees_due', 'avg_homework_days']
+        rate_columns += [f'rate_{window}d' for window in ROLLING_WINDOWS]
+        rate_columns += [f'{day}_rate' for day in WEEKDAYS]
+        df[rate_columns] = df[rate_columns].fillna(0.0)
+        df['fee_payment_rate'] = df['fee_payment_rate'].fillna(1.0)
+
+        return df[FEATURE_COLUMNS]
+
+    @staticmethod
+    def _attendance_features(profiles):
+        """Unpack attendance_profile vectors into a frame indexed by student_id"""
+        student_ids = [student_id for student_id, _ in profiles]
+        vectors = np.frombuffer(b''.join(vector for _, vector in profiles), dtype='<f8')
+        return pd.DataFrame(vectors.reshape(len(profiles), len(ATTENDANCE_PROFILE_COLUMNS)),
+                            index=pd.Index(student_ids, name='student_id'), columns=ATTENDANCE_PROFILE_COLUMNS)
+
+    @staticmethod
+    def _fee_features(fees):
+        grouped = fees.groupby('student_id')
+        out = pd.DataFrame({
+            'fee_records': grouped.size(),
+            'fees_paid': grouped['paid_amount'].sum(),
+            'fees_due': grouped['amount'].sum()
+        })
+        due = out['fees_due'].to_numpy(dtype=float)
+        paid = out['fees_paid'].to_numpy(dtype=float)
+        out['fee_payment_rate'] = np.divide(paid, due, out=np.ones_like(due), where=due > 0)
+        return out
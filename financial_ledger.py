@@ -0,0 +1,177 @@
+import sqlite3
+import argparse
+import pandas as pd
+
+# One row per month and fee type (teacher_id 0), or per month and teacher (account 'Salary').
+# Dues and outstanding amounts fall in a fee's due month, collections in its payment month.
+LEDGER_SCHEMA = """CREATE TABLE IF NOT EXISTS financial_ledger (
+    month TEXT NOT NULL,
+    account TEXT NOT NULL,
+    teacher_id INTEGER NOT NULL DEFAULT 0,
+    fees_due NUMERIC NOT NULL DEFAULT 0,
+    fees_paid NUMERIC NOT NULL DEFAULT 0,
+    outstanding NUMERIC NOT NULL DEFAULT 0,
+    salary_expense NUMERIC NOT NULL DEFAULT 0,
+    records INTEGER NOT NULL DEFAULT 0,
+    payments INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, account, teacher_id)
+)"""
+
+SALARY_ACCOUNT = 'Salary'
+
+# 'YYYY-MM' of a fees / salary row; {row} is the table name, NEW or OLD
+FEE_DUE_MONTH = "COALESCE(substr({row}.due_date, 1, 7), 'Undated')"
+FEE_PAID_MONTH = "substr({row}.paid_date, 1, 7)"
+SALARY_MONTH = ("printf('%04d-%02d', {row}.year, CASE {row}.month "
+                + ' '.join(f"WHEN '{name}' THEN {number}" for number, name in enumerate(
+                    ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September',
+                     'October', 'November', 'December'], start=1))
+                + " END)")
+
+LEDGER_COLUMNS = ('month', 'account', 'teacher_id', 'fees_due', 'fees_paid', 'outstanding', 'salary_expense',
+                  'records', 'payments')
+
+
+def _ledger_entries(source, row, sign=''):
+    """(values in LEDGER_COLUMNS order, condition) of each ledger entry of `row` in `source`, negated when sign is '-'"""
+    if source == 'fees':
+        amount, paid = f"COALESCE({row}.amount, 0)", f"COALESCE({row}.paid_amount, 0)"
+        return [
+            ([FEE_DUE_MONTH.format(row=row), f"{row}.fee_type", "0", f"{sign}{amount}", "0",
+              f"{sign}({amount} - {paid})", "0", f"{sign}1", "0"], "true"),
+            ([FEE_PAID_MONTH.format(row=row), f"{row}.fee_type", "0", "0", f"{sign}{paid}", "0", "0", "0",
+              f"{sign}1"], f"{paid} <> 0 AND {row}.paid_date IS NOT NULL"),
+        ]
+    return [
+        ([SALARY_MONTH.format(row=row), f"'{SALARY_ACCOUNT}'", f"COALESCE({row}.teacher_id, 0)", "0", "0", "0",
+          f"{sign}COALESCE({row}.net_salary, 0)", f"{sign}1", "0"], "true"),
+    ]
+
+
+def _post(values, condition):
+    """Add one ledger entry to its row, creating the row on first use"""
+    totals = ', '.join(f"{column} = {column} + excluded.{column}" for column in LEDGER_COLUMNS[3:])
+    # The WHERE keeps the parser from reading ON CONFLICT as a join constraint
+    return (f"INSERT INTO financial_ledger ({', '.join(LEDGER_COLUMNS)}) SELECT {', '.join(values)} "
+            f"WHERE {condition} ON CONFLICT (month, account, teacher_id) DO UPDATE SET {totals};")
+
+
+class FinancialLedger:
+    """Monthly dues, collections, outstanding fees and salary expense, kept current by triggers on fees and salary"""
+
+    SOURCE_TABLES = ('fees', 'salary')
+
+    def install(self, connection):
+        """Create the ledger and its triggers; a new ledger is filled from the existing rows in the same transaction"""
+        existing = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        sources = [table for table in self.SOURCE_TABLES if table in existing]
+        if not sources:
+            return
+        connection.commit()
+        connection.execute("BEGIN IMMEDIATE")  # no write can land between the initial fill and the triggers
+        try:
+            connection.execute(LEDGER_SCHEMA)
+            for table in sources:
+                self._create_triggers(connection, table)
+            if 'financial_ledger' not in existing:
+                self._fill(connection, sources)
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def rebuild(self, connection):
+        """Recompute the whole ledger from fees and salary"""
+        self.install(connection)
+        existing = {name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute("DELETE FROM financial_ledger")
+            self._fill(connection, [table for table in self.SOURCE_TABLES if table in existing])
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    @staticmethod
+    def _create_triggers(connection, table):
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            statements = []
+            if event in ('UPDATE', 'DELETE'):
+                statements += [_post(*entry) for entry in _ledger_entries(table, 'OLD', '-')]
+            if event in ('INSERT', 'UPDATE'):
+                statements += [_post(*entry) for entry in _ledger_entries(table, 'NEW')]
+            if event != 'INSERT':
+                # Rows whose every entry was reversed are dropped
+                statements.append("DELETE FROM financial_ledger WHERE records = 0 AND payments = 0;")
+            body = '\n'.join(statements)
+            connection.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS financial_ledger_{table}_{event.lower()}
+                AFTER {event} ON {table}
+                BEGIN
+                    {body}
+                END
+            """)
+
+    @staticmethod
+    def _fill(connection, tables):
+        entries = ' UNION ALL '.join(
+            f"SELECT {', '.join(f'{value} as {column}' for value, column in zip(values, LEDGER_COLUMNS))} "
+            f"FROM {table} WHERE {condition}"
+            for table in tables for values, condition in _ledger_entries(table, table)
+        )
+        connection.execute(f"""
+            INSERT INTO financial_ledger ({', '.join(LEDGER_COLUMNS)})
+            SELECT month, account, teacher_id, {', '.join(f'SUM({column})' for column in LEDGER_COLUMNS[3:])}
+            FROM ({entries})
+            GROUP BY month, account, teacher_id
+        """)
+
+    @staticmethod
+    def monthly(connection):
+        """Income, expense and outstanding dues per month"""
+        return pd.read_sql_query("""
+            SELECT month as Month,
+                   SUM(fees_due) as Fees_Due,
+                   SUM(fees_paid) as Fees_Collected,
+                   SUM(outstanding) as Outstanding,
+                   SUM(salary_expense) as Salary_Expense,
+                   SUM(fees_paid) - SUM(salary_expense) as Net
+            FROM financial_ledger
+            GROUP BY month
+            ORDER BY month
+        """, connection)
+
+
+def main(rebuild=False):
+    print("=" * 80)
+    print("💰 FINANCIAL LEDGER")
+    print("=" * 80)
+
+    connection = sqlite3.connect('school_management.db')
+    try:
+        ledger = FinancialLedger()
+        if rebuild:
+            ledger.rebuild(connection)
+            print("♻️ Ledger rebuilt from fees and salary")
+        else:
+            ledger.install(connection)
+        monthly = FinancialLedger.monthly(connection)
+    finally:
+        connection.close()
+
+    if monthly.empty:
+        print("⚠️ No fees or salary records yet")
+    else:
+        print(monthly.to_string(index=False))
+        print(f"✅ {len(monthly)} months: ₹{monthly['Fees_Collected'].sum():,.0f} collected, "
+              f"₹{monthly['Salary_Expense'].sum():,.0f} paid in salaries, "
+              f"₹{monthly['Outstanding'].sum():,.0f} outstanding")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the monthly financial ledger maintained from fees and salary")
+    parser.add_argument('--rebuild', action='store_true', help="recompute the ledger from scratch")
+    args = parser.parse_args()
+    main(rebuild=args.rebuild)
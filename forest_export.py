@@ -0,0 +1,88 @@
+import numpy as np
+
+# Only NumPy is imported here so scoring workers can skip loading scikit-learn.
+
+
+def export_forest(model, path):
+    """Flatten a fitted RandomForestClassifier/Regressor into one .npz of node arrays"""
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    is_classifier = hasattr(model, 'classes_')
+    if getattr(model, 'n_outputs_', 1) != 1:
+        raise ValueError("Only single-output forests can be exported")
+
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    left, right, feature, threshold, value = [], [], [], [], []
+    for offset, tree in zip(offsets, trees):
+        node_ids = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left == -1
+        # Leaves point at themselves so traversal can run a fixed number of steps
+        left.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+        right.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+        feature.append(np.where(is_leaf, 0, tree.feature))
+        threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+        node_value = tree.value[:, 0, :]
+        if is_classifier:
+            totals = node_value.sum(axis=1, keepdims=True)
+            node_value = np.divide(node_value, totals, out=np.zeros_like(node_value), where=totals > 0)
+        value.append(node_value)
+
+    np.savez_compressed(
+        path,
+        left=np.concatenate(left).astype(np.int32),
+        right=np.concatenate(right).astype(np.int32),
+        feature=np.concatenate(feature).astype(np.int32),
+        threshold=np.concatenate(threshold).astype(np.float64),
+        value=np.concatenate(value).astype(np.float64),
+        roots=offsets[:-1].astype(np.int32),
+        max_depth=np.int32(max(tree.max_depth for tree in trees)),
+        n_features=np.int32(model.n_features_in_),
+        classes=np.asarray(model.classes_) if is_classifier else np.zeros(0)
+    )
+
+
+class CompiledForest:
+    """Vectorized NumPy predictor for a forest exported with export_forest"""
+
+    def __init__(self, path, chunk_size=4096):
+        self.chunk_size = chunk_size  # samples per traversal batch, bounds the (trees x samples) node matrix
+        with np.load(path) as data:
+            self.left = data['left']
+            self.right = data['right']
+            self.feature = data['feature']
+            self.threshold = data['threshold']
+            self.value = data['value']
+            self.roots = data['roots']
+            self.max_depth = int(data['max_depth'])
+            self.n_features_in_ = int(data['n_features'])
+            classes = data['classes']
+        self.is_classifier = len(classes) > 0
+        self.classes_ = classes if self.is_classifier else None
+
+    def _leaves(self, X):
+        """Leaf node of every (tree, sample) pair, walking all trees level by level"""
+        # scikit-learn compares float32 features against its thresholds
+        X = np.asarray(X, dtype=np.float32)
+        samples = np.arange(len(X))
+        nodes = np.repeat(self.roots[:, None], len(X), axis=1)
+        for _ in range(self.max_depth):
+            go_left = X[samples, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return nodes
+
+    def _mean_leaf_value(self, X):
+        X = np.asarray(X)
+        out = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), self.chunk_size):
+            chunk = X[start:start + self.chunk_size]
+            out[start:start + len(chunk)] = self.value[self._leaves(chunk)].mean(axis=0)
+        return out
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba is only available for classifiers")
+        return self._mean_leaf_value(X)
+
+    def predict(self, X):
+        if self.is_classifier:
+            return self.classes_[self._mean_leaf_value(X).argmax(axis=1)]
+        return self._mean_leaf_value(X)[:, 0]
@@ -0,0 +1,159 @@
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from feature_store import (StudentFeatureStore, ATTENDANCE_MODEL_FEATURES, RISK_MODEL_FEATURES,
+                           attendance_model_matrix, risk_model_matrix)
+from model_registry import ModelRegistry
+
+RISK_LABELS = ['Low Risk', 'Medium Risk', 'High Risk']
+
+
+class StudentPredictor:
+    """Batch scoring of registered models against the in-memory feature matrix"""
+
+    def __init__(self, db_path='school_management.db', registry=None, feature_store=None, max_staleness=300,
+                 compiled=False):
+        self.db_path = db_path
+        self.compiled = compiled  # score with exported NumPy forests instead of unpickled scikit-learn models
+        self.registry = registry or ModelRegistry()
+        self.feature_store = feature_store or StudentFeatureStore(db_path)
+        self.max_staleness = max_staleness  # seconds before the feature matrix is re-checked
+        self.models = {}
+        self.loaded_at = None
+        self._index = None
+        self._matrices = {}
+
+    def refresh(self):
+        """Reload the feature matrix and the current registered models"""
+        features = self.feature_store.load()
+        self._index = pd.Index(features['student_id'].to_numpy())
+        self._attendance_rate = features['attendance_rate'].to_numpy(dtype=float)
+        self._matrices = {
+            'student_risk': risk_model_matrix(features),
+            'attendance_prediction': attendance_model_matrix(features)
+        }
+
+        schemas = {'student_risk': RISK_MODEL_FEATURES, 'attendance_prediction': ATTENDANCE_MODEL_FEATURES}
+        for name, feature_names in schemas.items():
+            meta = self.registry.current(name)
+            if meta is None:
+                raise RuntimeError(f"No registered '{name}' model - run complete_ml_suite.py first")
+            if meta['feature_names'] != feature_names:
+                raise RuntimeError(f"Registered '{name}' model expects features {meta['feature_names']}")
+            cached = self.models.get(name)
+            if cached is None or cached[1]['version'] != meta['version']:
+                if self.compiled:
+                    model, _ = self.registry.load_compiled(name, meta['version'])
+                    if model is None:
+                        raise RuntimeError(f"'{name}' v{meta['version']} has no exported forest - retrain it")
+                    self.models[name] = (model, meta)
+                else:
+                    self.models[name] = self.registry.load(name, meta['version'])
+
+        self.loaded_at = time.monotonic()
+
+    @property
+    def student_ids(self):
+        self._ensure_fresh()
+        return self._index.to_numpy()
+
+    def _ensure_fresh(self):
+        if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_staleness:
+            self.refresh()
+
+    def _lookup(self, student_ids):
+        """Return (ids, positions, known-mask) for a batch of student ids"""
+        self._ensure_fresh()
+        ids = np.asarray(student_ids, dtype=np.int64).ravel()
+        positions = self._index.get_indexer(ids)
+        return ids, positions, positions >= 0
+
+    def predict_risk(self, student_ids):
+        """Risk category and class probabilities for each student id (NaN for unknown ids)"""
+        ids, positions, known = self._lookup(student_ids)
+        model, meta = self.models['student_risk']
+
+        probabilities = np.full((len(ids), len(RISK_LABELS)), np.nan)
+        categories = np.full(len(ids), None, dtype=object)
+        if known.any():
+            X = self._matrices['student_risk'][positions[known]]
+            proba = model.predict_proba(X)
+            known_proba = np.zeros((len(X), len(RISK_LABELS)))
+            known_proba[:, model.classes_.astype(int)] = proba  # classes absent from training stay 0
+            probabilities[known] = known_proba
+            categories[known] = np.asarray(RISK_LABELS, dtype=object)[known_proba.argmax(axis=1)]
+
+        return pd.DataFrame({
+            'student_id': ids,
+            'risk_category': categories,
+            'p_low_risk': probabilities[:, 0],
+            'p_medium_risk': probabilities[:, 1],
+            'p_high_risk': probabilities[:, 2],
+            'model_version': meta['version']
+        })
+
+    def predict_next_week_attendance(self, student_ids):
+        """Predicted next-week attendance rate for each student id (NaN for unknown ids)"""
+        ids, positions, known = self._lookup(student_ids)
+        model, meta = self.models['attendance_prediction']
+
+        predicted = np.full(len(ids), np.nan)
+        current = np.full(len(ids), np.nan)
+        if known.any():
+            predicted[known] = model.predict(self._matrices['attendance_prediction'][positions[known]])
+            current[known] = self._attendance_rate[positions[known]]
+
+        return pd.DataFrame({
+            'student_id': ids,
+            'current_attendance_rate': current,
+            'predicted_next_week_attendance': predicted,
+            'model_version': meta['version']
+        })
+
+
+_default_predictor = None
+
+
+def _predictor():
+    global _default_predictor
+    if _default_predictor is None:
+        _default_predictor = StudentPredictor()
+    return _default_predictor
+
+
+def predict_risk(student_ids):
+    """Score a batch of students with the current risk classifier"""
+    return _predictor().predict_risk(student_ids)
+
+
+def predict_next_week_attendance(student_ids):
+    """Score a batch of students with the current attendance regressor"""
+    return _predictor().predict_next_week_attendance(student_ids)
+
+
+def main(compiled=False):
+    print("=" * 80)
+    print("⚡ BATCH INFERENCE - RISK & ATTENDANCE")
+    print("=" * 80)
+
+    predictor = StudentPredictor(compiled=compiled)
+    student_ids = predictor.student_ids
+
+    for label, predict in [('Risk', predictor.predict_risk),
+                           ('Next-week attendance', predictor.predict_next_week_attendance)]:
+        start = time.perf_counter()
+        result = predict(student_ids)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"✅ {label}: scored {len(result)} students in {elapsed_ms:.1f} ms")
+
+    print(predictor.predict_risk(student_ids[:5]).to_string(index=False))
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch risk and attendance scoring")
+    parser.add_argument('--compiled', action='store_true',
+                        help="score with exported NumPy forests (no scikit-learn import)")
+    args = parser.parse_args()
+    main(compiled=args.compiled)
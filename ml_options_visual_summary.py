@@ -1,191 +1,227 @@
-import matplotlib.pyplot as plt
+import os
+import json
+import sqlite3
+import argparse
+import warnings
 import numpy as np
 import pandas as pd
-import warnings
-import os
+import matplotlib.image as mpimg
+from matplotlib.figure import Figure
+from matplotlib.ticker import StrMethodFormatter
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from batch_scoring import BatchScorer
+from change_tracking import ChangeTracker
+from financial_ledger import FinancialLedger
+from run_phase4_final import RISK_MODEL_NAME
 
 warnings.filterwarnings("ignore")
 
-def create_single_window_dashboard():
-    """Create all ML visualizations in one clean window"""
-    
-    # Configure matplotlib to prevent multiple windows
-    plt.ioff()  # Turn off interactive mode to prevent multiple windows
-    
-    # Create the main figure with proper spacing
-    fig = plt.figure(figsize=(16, 12))
-    fig.suptitle('ML Options Comprehensive Dashboard', fontsize=20, fontweight='bold', y=0.95)
-    
-    # Define the data
-    models = ['Attend Pred', 'HW Delay', 'Stud Risk', 'Lesson Perf']
-    implementation = [1, 0, 1, 0]  # 1=implemented, 0=not implemented
-    business_impact = [3, 2, 5, 3]
-    complexity = [3, 3, 2, 4]
-    accuracy = [85, 70, 100, 75]
-    
-    # Create DataFrame for easier handling
-    df = pd.DataFrame({
-        'Model': models,
-        'Implementation': implementation,
-        'Business': business_impact,
-        'Complexity': complexity,
-        'Accuracy': accuracy
-    })
-    
-    # Calculate priority scores
-    priority_scores = df['Implementation'] * df['Business'] * (6 - df['Complexity'])
-    
-    # Create 2x2 subplots with proper spacing
-    gs = fig.add_gridspec(2, 2, hspace=0.3, wspace=0.3)
-    
-    # Subplot 1: Bar chart (top-left)
-    ax1 = fig.add_subplot(gs[0, 0])
-    x = np.arange(len(models))
-    width = 0.25
-    
-    bars1 = ax1.bar(x - width, implementation, width, label='Implementation', color='#2E8B57', alpha=0.8)
-    bars2 = ax1.bar(x, business_impact, width, label='Business Impact', color='#20B2AA', alpha=0.8)
-    bars3 = ax1.bar(x + width, complexity, width, label='Complexity', color='#DAA520', alpha=0.8)
-    
-    # Add value labels on bars
-    for bars in [bars1, bars2, bars3]:
-        for bar in bars:
-            height = bar.get_height()
-            ax1.annotate(f'{int(height)}', 
-                        xy=(bar.get_x() + bar.get_width()/2, height),
-                        xytext=(0, 3), textcoords='offset points',
-                        ha='center', va='bottom', fontweight='bold')
-    
-    ax1.set_title('ML Option Comp Scores', fontweight='bold', fontsize=14)
-    ax1.set_xlabel('ML Options', fontweight='bold')
-    ax1.set_ylabel('Score', fontweight='bold')
-    ax1.set_xticks(x)
-    ax1.set_xticklabels(models, rotation=0)
-    ax1.legend(loc='upper left', fontsize=10)
-    ax1.set_ylim(0, 6)
-    ax1.grid(True, alpha=0.3)
-    
-    # Subplot 2: Scatter plot (top-right)
-    ax2 = fig.add_subplot(gs[0, 1])
-    colors = ['green' if impl else 'red' for impl in implementation]
-    sizes = [300 if impl else 150 for impl in implementation]
-    
-    scatter = ax2.scatter(complexity, accuracy, c=colors, s=sizes, alpha=0.7, edgecolors='black', linewidth=2)
-    
-    for i, model in enumerate(models):
-        ax2.annotate(model, (complexity[i], accuracy[i]), 
-                    xytext=(5, 5), textcoords='offset points',
-                    fontsize=9, fontweight='bold')
-    
-    ax2.set_xlabel('Complexity (1-5)', fontweight='bold')
-    ax2.set_ylabel('Expected Accuracy (%)', fontweight='bold')
-    ax2.set_title('Complexity vs Accuracy Analysis', fontweight='bold', fontsize=14)
-    ax2.grid(True, alpha=0.3)
-    ax2.set_xlim(0, 5)
-    ax2.set_ylim(60, 105)
-    
-    # Add legend
-    from matplotlib.lines import Line2D
-    legend_elements = [Line2D([0], [0], marker='o', color='w', markerfacecolor='green', 
-                             markersize=10, label='Implemented'),
-                      Line2D([0], [0], marker='o', color='w', markerfacecolor='red', 
-                             markersize=10, label='Not Implemented')]
-    ax2.legend(handles=legend_elements, loc='lower right', fontsize=10)
-    
-    # Subplot 3: Priority Heatmap (bottom-left)
-    ax3 = fig.add_subplot(gs[1, 0])
-    
-    # Create heatmap data
-    heatmap_data = np.array([priority_scores.values])
-    im = ax3.imshow(heatmap_data, cmap='RdYlGn', aspect='auto', vmin=0, vmax=max(priority_scores))
-    
-    ax3.set_xticks(range(len(models)))
-    ax3.set_xticklabels(models, rotation=45, ha='right')
-    ax3.set_yticks([0])
-    ax3.set_yticklabels(['Priority Score'])
-    ax3.set_title('Implementation Priority Heatmap', fontweight='bold', fontsize=14)
-    
-    # Add text annotations
-    for i, score in enumerate(priority_scores):
-        ax3.text(i, 0, f'{int(score)}', ha='center', va='center', 
-                color='black', fontweight='bold', fontsize=12)
-    
-    # Subplot 4: Business Impact by Status (bottom-right)
-    ax4 = fig.add_subplot(gs[1, 1])
-    
-    # Group data by implementation status
-    implemented_impact = [business_impact[i] for i in range(len(models)) if implementation[i]]
-    not_implemented_impact = [business_impact[i] for i in range(len(models)) if not implementation[i]]
-    
-    avg_implemented = np.mean(implemented_impact) if implemented_impact else 0
-    avg_not_implemented = np.mean(not_implemented_impact) if not_implemented_impact else 0
-    
-    categories = ['Not Implemented', 'Implemented']
-    values = [avg_not_implemented, avg_implemented]
-    colors_bar = ['red', 'green']
-    
-    bars = ax4.bar(categories, values, color=colors_bar, alpha=0.7, width=0.6)
-    
-    ax4.set_ylabel('Average Business Impact', fontweight='bold')
-    ax4.set_title('Business Impact by Implementation Status', fontweight='bold', fontsize=14)
-    ax4.set_ylim(0, 6)
-    ax4.grid(True, alpha=0.3)
-    
-    # Add value labels
-    for bar, value in zip(bars, values):
-        ax4.annotate(f'{value:.1f}', 
-                    xy=(bar.get_x() + bar.get_width()/2, bar.get_height()),
-                    xytext=(0, 3), textcoords='offset points',
-                    ha='center', va='bottom', fontweight='bold')
-    
-    # Save and show in single window
-    plt.tight_layout(rect=[0, 0, 1, 0.93])
-    plt.savefig('ml_dashboard_complete.png', dpi=300, bbox_inches='tight')
-    plt.show()  # This will show all plots in ONE window
-    
-    # Create summary table
-    create_summary_table(df, priority_scores)
-
-def create_summary_table(df, priority_scores):
-    """Create and display summary table"""
-    
-    # Add priority scores to dataframe
-    df['Priority_Score'] = priority_scores
-    df['Status'] = ['✓ Implemented' if impl else '✗ Not Implemented' for impl in df['Implementation']]
-    
-    print("\n" + "="*80)
-    print("ML OPTIONS COMPREHENSIVE ANALYSIS")
-    print("="*80)
-    
-    # Display formatted table
-    for i, row in df.iterrows():
-        print(f"\n{i+1}. {row['Model']}")
-        print(f"   Status: {row['Status']}")
-        print(f"   Business Impact: {row['Business']}/5")
-        print(f"   Complexity: {row['Complexity']}/5")
-        print(f"   Expected Accuracy: {row['Accuracy']}%")
-        print(f"   Priority Score: {int(row['Priority_Score'])}")
-        print("-" * 40)
-    
-    # Save to Excel
-    df.to_excel('ml_dashboard_analysis.xlsx', index=False)
-    print(f"\nAnalysis saved to: ml_dashboard_analysis.xlsx")
-    print("Dashboard image saved to: ml_dashboard_complete.png")
-    print("="*80)
-
-def main():
+# Panel name -> (builder method, tables it reads); a panel is re-rendered only when one of them changed
+PANELS = {
+    'attendance_trend': ('_attendance_trend', ('attendance',)),
+    'attendance_by_grade': ('_attendance_by_grade', ('attendance', 'students', 'grades')),
+    'risk_distribution': ('_risk_distribution', ('ml_predictions',)),
+    'fee_collection': ('_fee_collection', ('fees', 'salary')),
+}
+
+PANEL_SIZE = (8, 6)  # inches; every panel has the same pixel size so the dashboard is a plain grid of them
+DASHBOARD_COLUMNS = 2
+DASHBOARD_STATE_FILE = '.dashboard_state.json'
+
+
+class DashboardRenderer:
+    """School dashboard drawn from the live database, one cached PNG per panel, on the Agg canvas (no display)"""
+
+    def __init__(self, db_path='school_management.db', output_dir='dashboard', dpi=100):
+        self.db_path = db_path
+        self.output_dir = output_dir
+        self.dpi = dpi
+        self.tracker = ChangeTracker(sorted({table for _, tables in PANELS.values() for table in tables}))
+
+    def panel_path(self, name):
+        return os.path.join(self.output_dir, 'panels', f"{name}.png")
+
+    def render(self, force=False):
+        """Render the panels whose source tables changed (all with force=True); returns the dashboard path"""
+        os.makedirs(os.path.join(self.output_dir, 'panels'), exist_ok=True)
+        dashboard_path = os.path.join(self.output_dir, 'school_dashboard.png')
+        connection = sqlite3.connect(self.db_path)
+        try:
+            # The fee panel reads the ledger and the risk panel ml_predictions; create both before tracking them
+            BatchScorer.ensure_table(connection)
+            FinancialLedger().install(connection)
+            self.tracker.install(connection)
+            marks = self.tracker.marks(connection)
+            state = {} if force else self._read_state()
+
+            rendered = []
+            for name, (method_name, tables) in PANELS.items():
+                key = {'dpi': self.dpi, 'marks': {table: list(marks[table]) for table in tables}}
+                if state.get(name) == key and os.path.exists(self.panel_path(name)):
+                    print(f"♻️ {name}: unchanged, using cached panel")
+                    continue
+                figure = Figure(figsize=PANEL_SIZE)
+                FigureCanvasAgg(figure)
+                getattr(self, method_name)(connection, figure.add_subplot())
+                figure.tight_layout()
+                figure.savefig(self.panel_path(name), dpi=self.dpi)
+                state[name] = key
+                rendered.append(name)
+                print(f"✅ {name}: rendered")
+        finally:
+            connection.close()
+
+        if rendered or not os.path.exists(dashboard_path):
+            self._compose(dashboard_path)
+        self._write_state(state)
+        print(f"📊 {len(rendered)} of {len(PANELS)} panels rendered at {self.dpi} dpi")
+        return dashboard_path
+
+    def _compose(self, path):
+        """Tile the cached panel images into the dashboard without drawing anything again"""
+        images = [mpimg.imread(self.panel_path(name)) for name in PANELS]
+        blank = np.ones_like(images[0])
+        images += [blank] * (-len(images) % DASHBOARD_COLUMNS)
+        rows = [np.hstack(images[i:i + DASHBOARD_COLUMNS]) for i in range(0, len(images), DASHBOARD_COLUMNS)]
+        mpimg.imsave(path, np.vstack(rows))
+
+    def _read_state(self):
+        path = os.path.join(self.output_dir, DASHBOARD_STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable dashboard state: {e}")
+            return {}
+
+    def _write_state(self, state):
+        path = os.path.join(self.output_dir, DASHBOARD_STATE_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(state, file, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def _no_data(ax, title):
+        ax.set_title(title, fontweight='bold', fontsize=14)
+        ax.text(0.5, 0.5, 'No data yet', ha='center', va='center', fontsize=14, transform=ax.transAxes)
+        ax.set_axis_off()
+
+    def _attendance_trend(self, connection, ax):
+        """Daily attendance rate with its 7-day rolling mean"""
+        daily = pd.read_sql_query("""
+            SELECT substr(attendance_date, 1, 10) as day, AVG(status = 'Present') * 100 as rate
+            FROM attendance
+            GROUP BY day
+            ORDER BY day
+        """, connection, parse_dates=['day'])
+        if daily.empty:
+            return self._no_data(ax, 'Daily Attendance Rate')
+
+        ax.plot(daily['day'], daily['rate'], color='#20B2AA', alpha=0.5, label='Daily')
+        ax.plot(daily['day'], daily['rate'].rolling(7, min_periods=1).mean(), color='#2E8B57', linewidth=2,
+                label='7-day average')
+        ax.set_title('Daily Attendance Rate', fontweight='bold', fontsize=14)
+        ax.set_ylabel('Present (%)', fontweight='bold')
+        ax.set_ylim(0, 105)
+        ax.legend(loc='lower left', fontsize=10)
+        ax.grid(True, alpha=0.3)
+        ax.figure.autofmt_xdate()
+
+    def _attendance_by_grade(self, connection, ax):
+        """Attendance rate per grade"""
+        grades = pd.read_sql_query("""
+            SELECT g.grade_name, AVG(a.status = 'Present') * 100 as rate
+            FROM attendance a
+            JOIN students s ON a.student_id = s.student_id
+            JOIN grades g ON s.grade_id = g.grade_id
+            GROUP BY g.grade_level, g.grade_name
+            ORDER BY g.grade_level
+        """, connection)
+        if grades.empty:
+            return self._no_data(ax, 'Attendance by Grade')
+
+        bars = ax.bar(grades['grade_name'], grades['rate'], color='#20B2AA', alpha=0.8)
+        for bar, rate in zip(bars, grades['rate']):
+            ax.annotate(f'{rate:.1f}%', xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                        xytext=(0, 3), textcoords='offset points', ha='center', va='bottom', fontweight='bold')
+        ax.set_title('Attendance by Grade', fontweight='bold', fontsize=14)
+        ax.set_ylabel('Present (%)', fontweight='bold')
+        ax.set_ylim(0, 105)
+        ax.grid(True, alpha=0.3, axis='y')
+
+    def _risk_distribution(self, connection, ax):
+        """Students per predicted risk level in the newest stored risk predictions"""
+        risk = pd.read_sql_query("""
+            SELECT predicted_label, COUNT(*) as students
+            FROM ml_predictions
+            WHERE model_name = ? AND model_version = (SELECT MAX(model_version) FROM ml_predictions
+                                                      WHERE model_name = ?)
+            GROUP BY predicted_label
+        """, connection, params=(RISK_MODEL_NAME, RISK_MODEL_NAME))
+        if risk.empty:
+            return self._no_data(ax, 'Student Risk Distribution')
+
+        colors = {'Low Risk': 'green', 'Medium Risk': '#DAA520', 'High Risk': 'red'}
+        order = [label for label in colors if label in set(risk['predicted_label'])]
+        order += sorted(set(risk['predicted_label']) - set(order))
+        risk = risk.set_index('predicted_label').loc[order]
+        bars = ax.bar(risk.index, risk['students'], alpha=0.7,
+                      color=[colors.get(label, '#20B2AA') for label in risk.index])
+        for bar, count in zip(bars, risk['students']):
+            ax.annotate(f'{count} ({count * 100 / risk["students"].sum():.0f}%)',
+                        xy=(bar.get_x() + bar.get_width() / 2, bar.get_height()),
+                        xytext=(0, 3), textcoords='offset points', ha='center', va='bottom', fontweight='bold')
+        ax.set_title('Student Risk Distribution', fontweight='bold', fontsize=14)
+        ax.set_ylabel('Students', fontweight='bold')
+        ax.grid(True, alpha=0.3, axis='y')
+
+    def _fee_collection(self, connection, ax):
+        """Collected vs outstanding fees per fee type, from the financial ledger"""
+        fees = pd.read_sql_query("""
+            SELECT account as fee_type, SUM(fees_paid) as collected, SUM(outstanding) as outstanding
+            FROM financial_ledger
+            WHERE teacher_id = 0
+            GROUP BY account
+            ORDER BY SUM(fees_due) DESC
+        """, connection)
+        if fees.empty:
+            return self._no_data(ax, 'Fee Collection by Type')
+
+        ax.bar(fees['fee_type'], fees['collected'], color='#2E8B57', alpha=0.8, label='Collected')
+        ax.bar(fees['fee_type'], fees['outstanding'], bottom=fees['collected'], color='red', alpha=0.6,
+               label='Outstanding')
+        for i, row in fees.iterrows():
+            due = row['collected'] + row['outstanding']
+            if due:
+                ax.annotate(f"{row['collected'] * 100 / due:.0f}%", xy=(i, due), xytext=(0, 3),
+                            textcoords='offset points', ha='center', va='bottom', fontweight='bold')
+        ax.set_title('Fee Collection by Type', fontweight='bold', fontsize=14)
+        ax.set_ylabel('Amount (₹)', fontweight='bold')
+        ax.yaxis.set_major_formatter(StrMethodFormatter('{x:,.0f}'))
+        ax.tick_params(axis='x', labelrotation=20)
+        ax.legend(loc='upper right', fontsize=10)
+        ax.grid(True, alpha=0.3, axis='y')
+
+
+def main(db_path='school_management.db', output_dir='dashboard', dpi=100, force=False):
     """Main function to run the dashboard"""
-    print("Creating ML Options Dashboard...")
-    print("All visualizations will appear in ONE window")
-    print("-" * 50)
-    
-    create_single_window_dashboard()
-    
-    print("\n✅ Dashboard created successfully!")
-    print("📊 All 4 charts displayed in single window")
-    print("📁 Files generated:")
-    print("   - ml_dashboard_complete.png")
-    print("   - ml_dashboard_analysis.xlsx")
+    print("=" * 80)
+    print("📊 SCHOOL DASHBOARD")
+    print("=" * 80)
+
+    path = DashboardRenderer(db_path, output_dir, dpi).render(force=force)
+
+    print(f"📁 Dashboard saved to: {os.path.abspath(path)}")
+    print("=" * 80)
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Render the school dashboard from the live database")
+    parser.add_argument('--db', default='school_management.db', help="SQLite database to read")
+    parser.add_argument('--output-dir', default='dashboard', help="folder for the dashboard and its cached panels")
+    parser.add_argument('--dpi', type=int, default=100, help="resolution of every panel (default: 100)")
+    parser.add_argument('--force', action='store_true', help="re-render every panel, even unchanged ones")
+    args = parser.parse_args()
+    main(db_path=args.db, output_dir=args.output_dir, dpi=args.dpi, force=args.force)
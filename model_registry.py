@@ -0,0 +1,150 @@
+import os
+import json
+import pickle
+import hashlib
+from datetime import datetime
+import numpy as np
+from sklearn.model_selection import train_test_split
+from forest_export import export_forest, CompiledForest
+
+
+class ModelRegistry:
+    """Versioned on-disk store of trained models with their schema, fingerprint and metrics"""
+
+    def __init__(self, root='ml_model/registry'):
+        self.root = root
+
+    @staticmethod
+    def fingerprint(*arrays):
+        """Stable hash of the training data (shapes, dtypes and raw values)"""
+        digest = hashlib.sha1()
+        for array in arrays:
+            array = np.ascontiguousarray(array)
+            digest.update(f"{array.shape}|{array.dtype.str}|".encode('utf-8'))
+            digest.update(array.tobytes())
+        return digest.hexdigest()[:16]
+
+    def _model_dir(self, name):
+        return os.path.join(self.root, name)
+
+    def _version_dir(self, name, version):
+        return os.path.join(self._model_dir(name), f"v{version:04d}")
+
+    def versions(self, name):
+        """All saved versions of `name`, oldest first"""
+        model_dir = self._model_dir(name)
+        if not os.path.isdir(model_dir):
+            return []
+        return sorted(int(entry[1:]) for entry in os.listdir(model_dir)
+                      if entry.startswith('v') and entry[1:].isdigit())
+
+    def current(self, name):
+        """Metadata of the current version of `name`, or None"""
+        pointer = os.path.join(self._model_dir(name), 'CURRENT')
+        if not os.path.exists(pointer):
+            return None
+        with open(pointer, 'r', encoding='utf-8') as file:
+            version = int(file.read().strip())
+        return self.metadata(name, version)
+
+    def metadata(self, name, version):
+        with open(os.path.join(self._version_dir(name, version), 'meta.json'), 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def load(self, name, version=None):
+        """Return (model, metadata) for `version` (current when None), or (None, None)"""
+        meta = self.current(name) if version is None else self.metadata(name, version)
+        if meta is None:
+            return None, None
+        with open(os.path.join(self._version_dir(name, meta['version']), 'model.pkl'), 'rb') as file:
+            model = pickle.load(file)
+        return model, meta
+
+    def load_compiled(self, name, version=None):
+        """Return (CompiledForest, metadata) without unpickling scikit-learn objects, or (None, None)"""
+        meta = self.current(name) if version is None else self.metadata(name, version)
+        if meta is None:
+            return None, None
+        path = os.path.join(self._version_dir(name, meta['version']), 'forest.npz')
+        if not os.path.exists(path):
+            return None, meta
+        return CompiledForest(path), meta
+
+    def tuned_params(self, name):
+        """Hyperparameters recorded by the last tuning run for `name` ({} if never tuned)"""
+        meta = self.current(name)
+        return dict(meta.get('tuned_params') or {}) if meta else {}
+
+    def load_matching(self, name, feature_names, fingerprint, estimator=None):
+        """Load the current model only if it was trained on this schema and data (and estimator class, when given)"""
+        meta = self.current(name)
+        if meta is None:
+            return None, None
+        if (meta['feature_names'] != list(feature_names) or meta['training_fingerprint'] != fingerprint
+                or estimator not in (None, meta['estimator'])):
+            return None, meta
+        return self.load(name, meta['version'])
+
+    def fit_or_load(self, name, estimator, X, y, feature_names, metric, fingerprint=None, retrain=False):
+        """Return (model, holdout score) of `name`, training and registering it only on request or when
+        its feature schema or training data changed
+
+        metric is (name, fn(y_true, y_pred)); fingerprint defaults to one of X and y.
+        """
+        metric_name, metric_fn = metric
+        if fingerprint is None:
+            fingerprint = self.fingerprint(X, y)
+
+        if not retrain:
+            model, meta = self.load_matching(name, feature_names, fingerprint, type(estimator).__name__)
+            if model is not None:
+                print(f"♻️ Loaded {name} v{meta['version']} from registry (scoring only)")
+                return model, meta['metrics'][metric_name]
+
+        # Keep hyperparameters chosen by tune_risk_model.py across retrains
+        tuned_params = self.tuned_params(name)
+        estimator.set_params(**tuned_params)
+
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        estimator.fit(X_train, y_train)
+        score = metric_fn(y_test, estimator.predict(X_test))
+
+        meta = self.save(name, estimator, feature_names, fingerprint, {metric_name: score, 'samples': len(X)},
+                         extra={'tuned_params': tuned_params} if tuned_params else None)
+        print(f"💾 Registered {name} v{meta['version']}")
+        return estimator, score
+
+    def save(self, name, model, feature_names, fingerprint, metrics, extra=None):
+        """Serialize `model` as a new version of `name` and make it current"""
+        existing = self.versions(name)
+        version = (existing[-1] + 1) if existing else 1
+        version_dir = self._version_dir(name, version)
+        os.makedirs(version_dir, exist_ok=True)
+
+        with open(os.path.join(version_dir, 'model.pkl'), 'wb') as file:
+            pickle.dump(model, file)
+        if hasattr(model, 'estimators_') and hasattr(model.estimators_[0], 'tree_'):
+            export_forest(model, os.path.join(version_dir, 'forest.npz'))
+
+        meta = {
+            'name': name,
+            'version': version,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'estimator': type(model).__name__,
+            'params': {key: value for key, value in model.get_params().items()
+                       if isinstance(value, (int, float, str, bool, type(None)))},
+            'feature_names': list(feature_names),
+            'training_fingerprint': fingerprint,
+            'metrics': {key: float(value) for key, value in metrics.items()}
+        }
+        if extra:
+            meta.update(extra)
+        with open(os.path.join(version_dir, 'meta.json'), 'w', encoding='utf-8') as file:
+            json.dump(meta, file, indent=2)
+
+        pointer = os.path.join(self._model_dir(name), 'CURRENT')
+        with open(f"{pointer}.tmp", 'w', encoding='utf-8') as file:
+            file.write(str(version))
+        os.replace(f"{pointer}.tmp", pointer)
+
+        return meta
@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import SGDRegressor
+from report_writer import write_report, resolve_formats, REPORT_FORMATS
+
+
+class OnlineAttendanceModel:
+    """Incremental Model 1: learns each new day of attendance with partial_fit and running per-student stats"""
+
+    # What update() learns; everything else comes from the constructor, even when a saved state exists
+    LEARNED_STATE = ('last_rowid', 'days_learned', 'positions', 'student_ids', 'grade_level', 'total', 'present',
+                     'weekday_total', 'weekday_present', 'recent_rate', 'model')
+
+    def __init__(self, db_path='school_management.db', state_path='ml_model/cache/attendance_online_state.pkl',
+                 recent_weight=0.2, eta0=0.05):
+        self.db_path = db_path
+        self.state_path = state_path
+        self.recent_weight = recent_weight  # EWMA weight of the newest day
+        self.eta0 = eta0  # initial SGD learning rate, decaying with invscaling
+        # Deleting the state file replays the full attendance history on the next update
+        self.last_rowid = 0
+        self.days_learned = 0
+        self.positions = {}  # student_id -> row in the state arrays
+        self.student_ids = np.zeros(0, dtype=np.int64)
+        self.grade_level = np.zeros(0)
+        self.total = np.zeros(0)
+        self.present = np.zeros(0)
+        self.weekday_total = np.zeros((0, 7))
+        self.weekday_present = np.zeros((0, 7))
+        self.recent_rate = np.zeros(0)
+        self.model = SGDRegressor(learning_rate='invscaling', eta0=eta0, random_state=42)
+        self.load_state()
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, 'rb') as file:
+            state = pickle.load(file)
+        self.__dict__.update({key: state[key] for key in self.LEARNED_STATE if key in state})
+        # The restored regressor keeps its learned weights but uses the learning rate configured now
+        self.model.set_params(eta0=self.eta0)
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        state = {key: getattr(self, key) for key in self.LEARNED_STATE}
+        with open(f"{self.state_path}.tmp", 'wb') as file:
+            pickle.dump(state, file)
+        os.replace(f"{self.state_path}.tmp", self.state_path)
+
+    def _register_students(self, connection, student_ids):
+        """Grow the state arrays for students seen for the first time"""
+        new_ids = [int(i) for i in np.unique(student_ids) if int(i) not in self.positions]
+        if not new_ids:
+            return
+        placeholders = ','.join('?' * len(new_ids))
+        grades = dict(connection.execute(f"""
+            SELECT s.student_id, g.grade_level
+            FROM students s LEFT JOIN grades g ON s.grade_id = g.grade_id
+            WHERE s.student_id IN ({placeholders})
+        """, new_ids).fetchall())
+
+        start = len(self.student_ids)
+        for offset, student_id in enumerate(new_ids):
+            self.positions[student_id] = start + offset
+        count = len(new_ids)
+        self.student_ids = np.concatenate([self.student_ids, np.asarray(new_ids, dtype=np.int64)])
+        self.grade_level = np.concatenate([self.grade_level, [grades.get(i) or 0 for i in new_ids]])
+        self.total = np.concatenate([self.total, np.zeros(count)])
+        self.present = np.concatenate([self.present, np.zeros(count)])
+        self.weekday_total = np.vstack([self.weekday_total, np.zeros((count, 7))])
+        self.weekday_present = np.vstack([self.weekday_present, np.zeros((count, 7))])
+        self.recent_rate = np.concatenate([self.recent_rate, np.full(count, np.nan)])
+
+    def _features(self, rows):
+        """Model inputs for state rows `rows` (Monday = weekday 0, Friday = weekday 4)"""
+        def rate(present, total):
+            return np.divide(present, total, out=np.zeros_like(present), where=total > 0)
+
+        overall = rate(self.present[rows], self.total[rows])
+        recent = np.where(np.isnan(self.recent_rate[rows]), overall, self.recent_rate[rows])
+        return np.column_stack([
+            self.grade_level[rows] / 12.0,
+            rate(self.weekday_present[rows, 0], self.weekday_total[rows, 0]),
+            rate(self.weekday_present[rows, 4], self.weekday_total[rows, 4]),
+            overall,
+            recent
+        ])
+
+    def update(self, connection=None):
+        """Learn from attendance rows appended since the last update; returns the number of new rows"""
+        own_connection = connection is None
+        if own_connection:
+            connection = sqlite3.connect(self.db_path)
+        try:
+            new_rows = pd.read_sql_query("""
+                SELECT attendance_id, student_id, attendance_date, status
+                FROM attendance
+                WHERE attendance_id > ?
+            """, connection, params=(self.last_rowid,))
+            if new_rows.empty:
+                return 0
+
+            self._register_students(connection, new_rows['student_id'].to_numpy())
+
+            new_rows['present'] = (new_rows['status'] == 'Present').astype(float)
+            daily = (new_rows.groupby(['attendance_date', 'student_id'])['present']
+                     .agg(['sum', 'count']).reset_index().sort_values('attendance_date'))
+
+            for date, day in daily.groupby('attendance_date', sort=True):
+                rows = np.fromiter((self.positions[i] for i in day['student_id']), dtype=np.int64, count=len(day))
+                day_present = day['sum'].to_numpy()
+                day_total = day['count'].to_numpy(dtype=float)
+                day_rate = day_present / day_total
+
+                # Learn "history up to yesterday -> today's presence" for students with history
+                seen = self.total[rows] > 0
+                if seen.any():
+                    self.model.partial_fit(self._features(rows[seen]), day_rate[seen])
+                    self.days_learned += 1
+
+                weekday = pd.Timestamp(date).weekday()
+                self.total[rows] += day_total
+                self.present[rows] += day_present
+                self.weekday_total[rows, weekday] += day_total
+                self.weekday_present[rows, weekday] += day_present
+                previous = self.recent_rate[rows]
+                self.recent_rate[rows] = np.where(
+                    np.isnan(previous), day_rate,
+                    self.recent_weight * day_rate + (1 - self.recent_weight) * previous
+                )
+
+            self.last_rowid = int(new_rows['attendance_id'].max())
+            self.save_state()
+            return len(new_rows)
+        finally:
+            if own_connection:
+                connection.close()
+
+    def forecast(self, student_ids=None):
+        """Next-week attendance forecast from the current online state"""
+        if student_ids is None:
+            rows = np.arange(len(self.student_ids))
+        else:
+            rows = np.fromiter((self.positions.get(int(i), -1) for i in student_ids), dtype=np.int64)
+            rows = rows[rows >= 0]
+
+        X = self._features(rows)
+        if self.days_learned:
+            predicted = np.clip(self.model.predict(X), 0.0, 1.0)
+        else:
+            predicted = X[:, 4]  # no model yet: fall back to the recent rate
+
+        return pd.DataFrame({
+            'student_id': self.student_ids[rows],
+            'classes_seen': self.total[rows].astype(np.int64),
+            'attendance_rate': X[:, 3],
+            'recent_rate': X[:, 4],
+            'predicted_next_week_attendance': predicted
+        })
+
+
+def main(formats=('xlsx',), recent_weight=0.2, eta0=0.05):
+    print("=" * 80)
+    print("📈 ONLINE ATTENDANCE MODEL - DAILY UPDATE")
+    print("=" * 80)
+
+    model = OnlineAttendanceModel(recent_weight=recent_weight, eta0=eta0)
+    new_rows = model.update()
+    print(f"✅ Learned from {new_rows} new attendance rows ({model.days_learned} days learned in total)")
+
+    forecast = model.forecast()
+    os.makedirs('ml_model', exist_ok=True)
+    saved = write_report('ml_model/model1_online_attendance_forecast', {'Sheet1': forecast}, resolve_formats(formats))
+    print(f"📊 Forecast for {len(forecast)} students saved: {', '.join(saved)}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Learn new attendance days and forecast next week's attendance")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=['xlsx'],
+                        help="forecast file formats (default: xlsx; parquet needs pyarrow)")
+    parser.add_argument('--recent-weight', type=float, default=0.2, help="EWMA weight of the newest day (default: 0.2)")
+    parser.add_argument('--eta0', type=float, default=0.05, help="initial SGD learning rate (default: 0.05)")
+    args = parser.parse_args()
+    main(formats=args.formats, recent_weight=args.recent_weight, eta0=args.eta0)
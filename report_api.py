@@ -0,0 +1,294 @@
+import json
+import hashlib
+import sqlite3
+import argparse
+import threading
+from datetime import date
+from collections import OrderedDict
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from attendance_queries import AttendanceQuery, ensure_attendance_indexes, SUMMARY_COLUMNS
+from batch_scoring import BatchScorer, PREDICTION_COLUMNS
+from financial_ledger import FinancialLedger, LEDGER_COLUMNS
+from report_writer import StreamedQuery, frame_batches
+from run_phase4_final import Phase4FinalTesting, current_month, REPORT_STEPS, AS_OF_REPORTS, RISK_MODEL_NAME
+from school_metrics import SchoolMetrics
+
+# Endpoint name of every Phase 4 report: its file name without the number prefix
+REPORT_ENDPOINTS = {stem.split('_', 1)[1]: (method_name, stem) for _, method_name, stem, _ in REPORT_STEPS}
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ReportAPI:
+    """Phase 4 reports, headline metrics and stored predictions as JSON, cached until the database changes"""
+
+    def __init__(self, db_path='school_management.db', cache_size=256):
+        self.db_path = db_path
+        self.cache_size = cache_size  # responses and report results kept, least recently used evicted first
+        self.reports = Phase4FinalTesting()
+        self.reports.db_path = db_path
+        self.metrics = SchoolMetrics(db_path)
+
+        # Predictions are read from ml_predictions; create it once so read-only request connections can query it
+        connection = sqlite3.connect(db_path)
+        try:
+            BatchScorer.ensure_table(connection)
+            ensure_attendance_indexes(connection)
+            FinancialLedger().install(connection)
+        finally:
+            connection.close()
+
+        # PRAGMA data_version on this idle connection changes whenever any other connection commits
+        self._watcher = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        self._key_locks = {}
+
+    def data_version(self):
+        with self._lock:
+            return self.metrics.data_version(self._watcher)[0]
+
+    def _cached(self, key, build):
+        """Value of `key`, built once even when many requests miss it at the same time"""
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._cache:
+                    return self._cache[key]
+            try:
+                value = build()
+                with self._lock:
+                    self._cache[key] = value
+                    while len(self._cache) > self.cache_size:
+                        self._cache.popitem(last=False)
+                return value
+            finally:
+                # Also on failure, so a key whose build raised does not keep its lock forever
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def _connect(self):
+        return sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=30)
+
+    def _report_sheets(self, name, version):
+        """{sheet: (columns, rows)} of one report, queried once per data version (and month, for AS_OF_REPORTS)"""
+        method_name, stem = REPORT_ENDPOINTS[name]
+        options = {'as_of_month': current_month()} if stem in AS_OF_REPORTS else {}
+
+        def build():
+            connection = self._connect()
+            try:
+                sheets = {}
+                for sheet_name, sheet in getattr(self.reports, method_name)(connection, **options).items():
+                    if isinstance(sheet, StreamedQuery):
+                        columns, batches = list(sheet.columns), sheet.batches(connection)
+                    else:
+                        columns, batches = [str(column) for column in sheet.columns], frame_batches(sheet)
+                    sheets[sheet_name] = (columns, [row for batch in batches for row in batch])
+                return sheets
+            finally:
+                connection.close()
+
+        return self._cached(('report', name, version, *options.values()), build)
+
+    @staticmethod
+    def _page_params(params):
+        try:
+            page = int(params.get('page', 1))
+            page_size = int(params.get('page_size', DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ApiError(400, "page and page_size must be integers")
+        if page < 1 or not 1 <= page_size <= MAX_PAGE_SIZE:
+            raise ApiError(400, f"page must be >= 1 and page_size between 1 and {MAX_PAGE_SIZE}")
+        return page, page_size
+
+    @staticmethod
+    def _page(columns, rows, total, page, page_size, **extra):
+        return {**extra, 'page': page, 'page_size': page_size, 'total_rows': total,
+                'pages': -(-total // page_size), 'columns': columns,
+                'rows': [dict(zip(columns, row)) for row in rows]}
+
+    def _report_payload(self, name, params, version):
+        if name not in REPORT_ENDPOINTS:
+            raise ApiError(404, f"Unknown report '{name}'")
+        sheets = self._report_sheets(name, version)
+        sheet_name = params.get('sheet', next(iter(sheets)))
+        if sheet_name not in sheets:
+            raise ApiError(404, f"Report '{name}' has no sheet '{sheet_name}' (sheets: {', '.join(sheets)})")
+        page, page_size = self._page_params(params)
+        columns, rows = sheets[sheet_name]
+        start = (page - 1) * page_size
+        return self._page(columns, rows[start:start + page_size], len(rows), page, page_size,
+                          report=name, sheet=sheet_name, sheets=list(sheets))
+
+    def _predictions_payload(self, params):
+        """One page of the newest version of a model's stored predictions, in student_id order"""
+        model_name = params.get('model', RISK_MODEL_NAME)
+        page, page_size = self._page_params(params)
+        connection = self._connect()
+        try:
+            version, total = connection.execute("""
+                SELECT model_version, COUNT(*) FROM ml_predictions
+                WHERE model_name = ? AND model_version = (SELECT MAX(model_version) FROM ml_predictions
+                                                          WHERE model_name = ?)
+            """, (model_name, model_name)).fetchone()
+            if version is None:
+                raise ApiError(404, f"No stored predictions for model '{model_name}'")
+            # Served by the (model_name, model_version, student_id) primary key
+            rows = connection.execute(f"""
+                SELECT {', '.join(PREDICTION_COLUMNS)} FROM ml_predictions
+                WHERE model_name = ? AND model_version = ?
+                ORDER BY student_id LIMIT ? OFFSET ?
+            """, (model_name, version, page_size, (page - 1) * page_size)).fetchall()
+        finally:
+            connection.close()
+        return self._page(PREDICTION_COLUMNS, rows, total, page, page_size,
+                          model=model_name, model_version=version)
+
+    def _attendance_payload(self, params):
+        """One page of the attendance report for the date range, grade, section, subject, teacher and status given"""
+        for name in ('from', 'to'):
+            if name in params:
+                try:
+                    date.fromisoformat(params[name])
+                except ValueError:
+                    raise ApiError(400, f"{name} must be a YYYY-MM-DD date")
+        if params.get('status', 'Present') not in ('Present', 'Absent'):
+            raise ApiError(400, "status must be Present or Absent")
+
+        def id_or_name(value):
+            return int(value) if value is not None and value.isdigit() else value
+
+        query = AttendanceQuery(start_date=params.get('from'), end_date=params.get('to'),
+                                grade=id_or_name(params.get('grade')), section=params.get('section'),
+                                subject=id_or_name(params.get('subject')), teacher=id_or_name(params.get('teacher')),
+                                status=params.get('status'))
+        page, page_size = self._page_params(params)
+        sql, query_params = query.summary_sql()
+        connection = self._connect()
+        try:
+            rows = connection.execute(sql, query_params).fetchall()
+        finally:
+            connection.close()
+        start = (page - 1) * page_size
+        return self._page(SUMMARY_COLUMNS, rows[start:start + page_size], len(rows), page, page_size,
+                          filters=query.label())
+
+    def _ledger_payload(self, params):
+        """Monthly income, expense and outstanding dues, or every ledger row of one month with ?month=YYYY-MM"""
+        connection = self._connect()
+        try:
+            if 'month' in params:
+                rows = connection.execute(f"""
+                    SELECT {', '.join(LEDGER_COLUMNS)} FROM financial_ledger
+                    WHERE month = ? ORDER BY account, teacher_id
+                """, (params['month'],)).fetchall()
+                return {'month': params['month'], 'columns': list(LEDGER_COLUMNS),
+                        'rows': [dict(zip(LEDGER_COLUMNS, row)) for row in rows]}
+            monthly = FinancialLedger.monthly(connection)
+        finally:
+            connection.close()
+        return {'columns': list(monthly.columns), 'rows': monthly.to_dict('records')}
+
+    def payload(self, path, params, version):
+        parts = [part for part in path.split('/') if part]
+        if parts == ['api', 'metrics']:
+            return self.metrics.snapshot()
+        if parts == ['api', 'reports']:
+            return {'reports': [{'name': name, 'url': f"/api/reports/{name}"} for name in REPORT_ENDPOINTS]}
+        if len(parts) == 3 and parts[:2] == ['api', 'reports']:
+            return self._report_payload(parts[2], params, version)
+        if parts == ['api', 'predictions']:
+            return self._predictions_payload(params)
+        if parts == ['api', 'attendance']:
+            return self._attendance_payload(params)
+        if parts == ['api', 'ledger']:
+            return self._ledger_payload(params)
+        raise ApiError(404, f"Unknown endpoint '{path}'")
+
+    def response(self, target):
+        """Return (status, JSON body, ETag) for a GET of `target`; bodies are cached per data version"""
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        version = self.data_version()
+
+        def build():
+            try:
+                payload = {'data_version': version, **self.payload(url.path, params, version)}
+                status = 200
+            except ApiError as e:
+                payload, status = {'error': str(e)}, e.status
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+            return status, body, f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+        return self._cached(('response', url.path, tuple(sorted(params.items())), version), build)
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    api = None  # set by main() before the server starts
+
+    def do_GET(self):
+        try:
+            status, body, etag = self.api.response(self.path)
+        except Exception as e:
+            self.log_error("Error serving %s: %r", self.path, e)
+            status, etag = 500, None
+            body = json.dumps({'error': f"Internal error: {e}"}, ensure_ascii=False).encode('utf-8')
+        if status == 200 and etag in self.headers.get('If-None-Match', ''):
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.end_headers()
+            return
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if status == 200:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')  # clients revalidate every time, usually getting a 304
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def main(host='127.0.0.1', port=8000, db_path='school_management.db'):
+    print("=" * 80)
+    print("🌐 SCHOOL REPORTING API")
+    print("=" * 80)
+
+    ReportRequestHandler.api = ReportAPI(db_path)
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    print(f"✅ Serving on http://{host}:{port}/api/reports")
+    print("  📊 /api/metrics")
+    for name in REPORT_ENDPOINTS:
+        print(f"  📋 /api/reports/{name}?page=1&page_size={DEFAULT_PAGE_SIZE}")
+    print(f"  🤖 /api/predictions?model={RISK_MODEL_NAME}")
+    print("  💰 /api/ledger?month=YYYY-MM")
+    print("  📅 /api/attendance?from=YYYY-MM-DD&to=YYYY-MM-DD&grade=7&section=B&subject=&teacher=&status=")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Stopped")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve Phase 4 reports, metrics and ML predictions as JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--db', default='school_management.db', help="SQLite database to serve")
+    args = parser.parse_args()
+    main(host=args.host, port=args.port, db_path=args.db)
@@ -0,0 +1,269 @@
+import os
+import csv
+import html
+import json
+import sqlite3
+import importlib.util
+from itertools import islice
+
+# One sheet of an .xlsx workbook holds 1,048,576 rows including the header
+EXCEL_MAX_ROWS = 1048575
+
+REPORT_FORMATS = ('xlsx', 'csv', 'parquet', 'ndjson', 'html')
+
+# Parquet is written through pyarrow, which is not in requirements.txt
+PARQUET_AVAILABLE = importlib.util.find_spec('pyarrow') is not None
+
+
+def _batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class StreamedQuery:
+    """A report sheet kept as SQL, so its rows are streamed from the cursor instead of held in a DataFrame"""
+
+    def __init__(self, sql, columns, params=(), batch_size=10000):
+        self.sql = sql
+        self.columns = columns
+        self.params = params
+        self.batch_size = batch_size  # rows fetched per round trip, bounds memory
+
+    def batches(self, connection):
+        cursor = connection.execute(self.sql, self.params)
+        while True:
+            batch = cursor.fetchmany(self.batch_size)
+            if not batch:
+                return
+            yield batch
+
+
+def frame_batches(df, batch_size=10000):
+    """DataFrame rows as tuples with NaN turned into None, in lists of batch_size"""
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    return _batches(rows, batch_size)
+
+
+class XlsxStreamWriter:
+    """xlsxwriter workbook in constant_memory mode: every row is flushed to disk as soon as it is written"""
+
+    extension = 'xlsx'
+
+    def __init__(self, stem, multi_sheet=False, max_rows=EXCEL_MAX_ROWS):
+        import xlsxwriter  # only needed when xlsx is one of the requested formats
+
+        self.paths = [f"{stem}.xlsx"]
+        self.workbook = xlsxwriter.Workbook(self.paths[0], {'constant_memory': True,
+                                                            'strings_to_formulas': False,
+                                                            'strings_to_urls': False})
+        self.header_format = self.workbook.add_format({'bold': True})
+        self.max_rows = max_rows  # data rows per sheet before continuing on the next one
+
+    def begin_sheet(self, name, columns):
+        self.name, self.columns = name, columns
+        self.part = 1
+        self._add_worksheet()
+
+    def _add_worksheet(self):
+        # Sheets past the row limit continue as `name (2)`, `name (3)`... (sheet names max out at 31 chars)
+        name = self.name if self.part == 1 else f"{self.name[:25]} ({self.part})"
+        self.worksheet = self.workbook.add_worksheet(name)
+        self.worksheet.write_row(0, 0, self.columns, self.header_format)
+        self.row_number = 0
+
+    def write_rows(self, rows):
+        for row in rows:
+            if self.row_number == self.max_rows:
+                self.part += 1
+                self._add_worksheet()
+            self.row_number += 1
+            self.worksheet.write_row(self.row_number, 0, row)
+
+    def end_sheet(self):
+        pass
+
+    def close(self):
+        self.workbook.close()
+
+
+class _FilePerSheetWriter:
+    """Base for single-table formats: one file per sheet, `stem.sheet.ext` when a report has several"""
+
+    extension = None
+
+    def __init__(self, stem, multi_sheet=False):
+        self.stem = stem
+        self.multi_sheet = multi_sheet
+        self.paths = []
+
+    def begin_sheet(self, name, columns):
+        path = f"{self.stem}.{name}.{self.extension}" if self.multi_sheet else f"{self.stem}.{self.extension}"
+        self.paths.append(path)
+        self.columns = columns
+        self._open(path, columns)
+
+    def close(self):
+        # A sheet left open by an error still releases its file
+        file = getattr(self, 'file', None)
+        if file is not None and not file.closed:
+            file.close()
+
+
+class CsvWriter(_FilePerSheetWriter):
+    extension = 'csv'
+
+    def _open(self, path, columns):
+        self.file = open(path, 'w', newline='', encoding='utf-8')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        self.writer.writerows(rows)
+
+    def end_sheet(self):
+        self.file.close()
+
+
+class NdjsonWriter(_FilePerSheetWriter):
+    extension = 'ndjson'
+
+    def _open(self, path, columns):
+        self.file = open(path, 'w', encoding='utf-8')
+
+    def write_rows(self, rows):
+        self.file.writelines(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False, default=str) + '\n'
+                             for row in rows)
+
+    def end_sheet(self):
+        self.file.close()
+
+
+class ParquetWriter(_FilePerSheetWriter):
+    """Row batches become Parquet row groups; column types come from the first batch"""
+
+    extension = 'parquet'
+
+    def _open(self, path, columns):
+        self.path = path
+        self.writer = None
+
+    def write_rows(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrays = [pa.array(values) for values in zip(*rows)]
+        if self.writer is None:
+            # A column that is all NULL in the first batch is stored as text
+            self.schema = pa.schema([(name, pa.string() if pa.types.is_null(array.type) else array.type)
+                                     for name, array in zip(self.columns, arrays)])
+            self.writer = pq.ParquetWriter(self.path, self.schema)
+        arrays = [array.cast(field.type) for array, field in zip(arrays, self.schema)]
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def end_sheet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:  # empty result: header-only file
+            self.writer = pq.ParquetWriter(self.path, pa.schema([(name, pa.string()) for name in self.columns]))
+        self.writer.close()
+
+
+class HtmlWriter:
+    """Static HTML page with one table per sheet"""
+
+    extension = 'html'
+
+    def __init__(self, stem, multi_sheet=False):
+        self.paths = [f"{stem}.html"]
+        self.multi_sheet = multi_sheet
+        self.file = open(self.paths[0], 'w', encoding='utf-8')
+        title = html.escape(os.path.basename(stem))
+        self.file.write(f"<!DOCTYPE html>\n<html>\n<head><meta charset=\"utf-8\"><title>{title}</title></head>\n"
+                        f"<body>\n<h1>{title}</h1>\n")
+
+    def begin_sheet(self, name, columns):
+        if self.multi_sheet:
+            self.file.write(f"<h2>{html.escape(name)}</h2>\n")
+        header = ''.join(f"<th>{html.escape(str(column))}</th>" for column in columns)
+        self.file.write(f"<table border=\"1\">\n<thead><tr>{header}</tr></thead>\n<tbody>\n")
+
+    def write_rows(self, rows):
+        self.file.writelines(
+            '<tr>' + ''.join(f"<td>{'' if value is None else html.escape(str(value))}</td>" for value in row)
+            + '</tr>\n' for row in rows
+        )
+
+    def end_sheet(self):
+        self.file.write("</tbody>\n</table>\n")
+
+    def close(self):
+        self.file.write("</body>\n</html>\n")
+        self.file.close()
+
+
+FORMAT_WRITERS = {
+    'xlsx': XlsxStreamWriter,
+    'csv': CsvWriter,
+    'parquet': ParquetWriter,
+    'ndjson': NdjsonWriter,
+    'html': HtmlWriter
+}
+
+
+def resolve_formats(formats):
+    """Requested formats in REPORT_FORMATS order, without parquet when pyarrow is missing"""
+    formats = [fmt for fmt in REPORT_FORMATS if fmt in set(formats or ('xlsx',))]
+    if 'parquet' in formats and not PARQUET_AVAILABLE:
+        print("⚠️ pyarrow is not installed - skipping Parquet output")
+        formats.remove('parquet')
+    return tuple(formats)
+
+
+def write_report(stem, sheets, formats=('xlsx',), db_path=None):
+    """Write {sheet name: StreamedQuery or DataFrame} once per format as `stem.<ext>`; returns the paths written
+
+    Every sheet is read once, in batches, and each batch goes to all the formats.
+    StreamedQuery sheets are read from a read-only connection to db_path.
+    """
+    connection = None
+    if any(isinstance(sheet, StreamedQuery) for sheet in sheets.values()):
+        connection = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30)
+
+    writers = [FORMAT_WRITERS[fmt](stem, multi_sheet=len(sheets) > 1) for fmt in formats]
+    try:
+        for sheet_name, sheet in sheets.items():
+            if isinstance(sheet, StreamedQuery):
+                columns, batches = list(sheet.columns), sheet.batches(connection)
+            else:
+                columns, batches = [str(column) for column in sheet.columns], frame_batches(sheet)
+            for writer in writers:
+                writer.begin_sheet(sheet_name, columns)
+            for batch in batches:
+                for writer in writers:
+                    writer.write_rows(batch)
+            for writer in writers:
+                writer.end_sheet()
+    finally:
+        for writer in writers:
+            writer.close()
+        if connection is not None:
+            connection.close()
+    return [path for writer in writers for path in writer.paths]
+
+
+def report_exists(stem):
+    """True when a report was written to `stem` in any format"""
+    directory, name = os.path.split(stem)
+    return name in written_reports(directory or '.')
+
+
+def written_reports(directory):
+    """Names of the reports in `directory`, whatever formats they were written in"""
+    extensions = {writer.extension for writer in FORMAT_WRITERS.values()}
+    return {file.split('.')[0] for file in os.listdir(directory)
+            if '.' in file and file.rsplit('.', 1)[1] in extensions}
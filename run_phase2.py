@@ -3,12 +3,14 @@ import pandas as pd
 import sqlite3
 from datetime import datetime, timedelta
 import random
+from school_metrics import SchoolMetrics
 
 class Phase2ExcelProcessor:
     def __init__(self):
         self.db_path = 'school_management.db'
         self.connection = None
         self.sample_data_dir = 'sample_data'
+        self.metrics = SchoolMetrics(self.db_path)
         
     def connect_database(self):
         """Connect to the database"""
@@ -308,25 +310,22 @@ class Phase2ExcelProcessor:
         """Verify all project requirements are met"""
         print("\n🔍 Verifying Project Requirements...")
         
+        m = self.metrics.snapshot(self.connection)
+        
         # Check school count
-        school_count = self.connection.execute("SELECT COUNT(*) FROM schools").fetchone()[0]
-        print(f"✅ Schools: {school_count}/1")
+        print(f"✅ Schools: {m['schools']}/1")
         
         # Check grades (should be 3)
-        grade_count = self.connection.execute("SELECT COUNT(*) FROM grades").fetchone()[0]
-        print(f"✅ Grades: {grade_count}/3")
+        print(f"✅ Grades: {m['grades']}/3")
         
         # Check sections (should be 6)
-        section_count = self.connection.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
-        print(f"✅ Sections: {section_count}/6")
+        print(f"✅ Sections: {m['sections']}/6")
         
         # Check students (should be 60)
-        student_count = self.connection.execute("SELECT COUNT(*) FROM students").fetchone()[0]
-        print(f"✅ Students: {student_count}/60")
+        print(f"✅ Students: {m['students']}/60")
         
         # Check teachers (should be 8)
-        teacher_count = self.connection.execute("SELECT COUNT(*) FROM teachers").fetchone()[0]
-        print(f"✅ Teachers: {teacher_count}/8")
+        print(f"✅ Teachers: {m['teachers']}/8")
         
         print(f"\n🎉 Phase 2 Complete! All base data loaded successfully!")
         return True
@@ -4,14 +4,54 @@ import random
 from datetime import datetime, timedelta
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
 from sklearn.metrics import accuracy_score, classification_report
 import os
+import argparse
+from feature_store import StudentFeatureStore
+from model_registry import ModelRegistry
+from batch_scoring import BatchScorer, ReportCollector
+from school_metrics import SchoolMetrics
+from report_writer import write_report, resolve_formats, report_exists, REPORT_FORMATS
+
+PHASE3_RISK_FEATURES = ['attendance_rate', 'grade_level', 'fee_payment_rate']
+
+def phase3_risk_matrix(store):
+    """Phase 3 features: PHASE3_RISK_FEATURES"""
+    attendance_rate = store['attendance_rate'].to_numpy() * 100
+    fee_records = store['fee_records'].to_numpy()
+    fee_payment_rate = np.divide(store['fees_paid'].to_numpy(dtype=float), fee_records * 5000,
+                                 out=np.zeros(len(store)), where=fee_records > 0) * 100
+    return np.column_stack([attendance_rate, store['grade_level'].to_numpy(), fee_payment_rate])
+
+def phase3_risk_training_data(store):
+    """Phase 3 risk features and attendance-based risk labels"""
+    X = phase3_risk_matrix(store)
+    attendance_rate = X[:, 0]
+    
+    # Label: Risk category based on attendance
+    y = np.select([attendance_rate >= 85, attendance_rate >= 70], [0, 1], default=2)  # Low / Medium / High Risk
+    return X, y
+
+def phase3_report_rows(chunk, predictions):
+    """Excel report rows for one scored chunk of students"""
+    features = phase3_risk_matrix(chunk)
+    return pd.DataFrame({
+        'Student_Name': chunk['student_name'].to_numpy(),
+        'Attendance_Rate': features[:, 0],
+        'Grade_Level': features[:, 1],
+        'Fee_Payment_Rate': features[:, 2],
+        'Risk_Category': predictions['predicted_label'].to_numpy()
+    })
 
 class Phase3AdvancedData:
-    def __init__(self):
+    def __init__(self, retrain=False, formats=('xlsx',)):
         self.db_path = 'school_management.db'
         self.connection = None
+        self.feature_store = StudentFeatureStore(self.db_path)
+        self.registry = ModelRegistry()
+        self.metrics = SchoolMetrics(self.db_path)
+        self.retrain = retrain
+        self.formats = resolve_formats(formats)
         
     def connect_database(self):
         """Connect to database"""
@@ -324,137 +364,82 @@ class Phase3AdvancedData:
         # Create ML directory
         os.makedirs('ml_model', exist_ok=True)
         
-        # Extract features for ML model
-        ml_data = self.connection.execute("""
-            SELECT 
-                s.student_id,
-                s.student_name,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present_count,
-                COUNT(a.attendance_id) as total_attendance,
-                g.grade_level,
-                COUNT(DISTINCT f.fee_id) as fee_records,
-                SUM(f.paid_amount) as total_fees_paid
-            FROM students s
-            LEFT JOIN attendance a ON s.student_id = a.student_id
-            LEFT JOIN grades g ON s.grade_id = g.grade_id
-            LEFT JOIN fees f ON s.student_id = f.student_id
-            GROUP BY s.student_id, s.student_name, g.grade_level
-        """).fetchall()
-        
-        # Prepare data for ML
-        features = []
-        labels = []
-        student_names = []
+        # Extract features for ML model from the shared feature store
+        store = self.feature_store.load(self.connection)
+        store = store[store['total_classes'] > 0]  # Only students with attendance data
         
-        for student_id, name, present, total, grade_level, fee_records, fees_paid in ml_data:
-            if total > 0:  # Only students with attendance data
-                attendance_rate = (present / total) * 100
-                fee_payment_rate = (fees_paid / (fee_records * 5000)) * 100 if fee_records > 0 else 0
-                
-                # Features: [attendance_rate, grade_level, fee_payment_rate]
-                features.append([attendance_rate, grade_level, fee_payment_rate])
-                
-                # Label: Risk category based on attendance
-                if attendance_rate >= 85:
-                    label = 0  # Low Risk
-                elif attendance_rate >= 70:
-                    label = 1  # Medium Risk  
-                else:
-                    label = 2  # High Risk
-                
-                labels.append(label)
-                student_names.append(name)
-        
-        # Convert to numpy arrays
-        X = np.array(features)
-        y = np.array(labels)
+        X, y = phase3_risk_training_data(store)
         
-        # Train ML model
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+        # Score with the registered model unless retraining was requested or the schema or data changed
+        # (with hyperparameters from tune_risk_model.py, if any)
+        model, accuracy = self.registry.fit_or_load(
+            'phase3_student_risk', RandomForestClassifier(n_estimators=100, random_state=42), X, y,
+            PHASE3_RISK_FEATURES, ('accuracy', accuracy_score), retrain=self.retrain
+        )
         
-        model = RandomForestClassifier(n_estimators=100, random_state=42)
-        model.fit(X_train, y_train)
+        # Stream predictions for all students into ml_predictions, keeping an Excel copy
+        report = ReportCollector(phase3_report_rows)
+        scored, meta = BatchScorer(self.db_path, self.registry, self.feature_store).score(
+            'phase3_student_risk', phase3_risk_matrix, classifier=True, on_chunk=report
+        )
+        ml_results = report.frame()
         
-        # Evaluate model
-        y_pred = model.predict(X_test)
-        accuracy = accuracy_score(y_test, y_pred)
-        
-        # Create predictions for all students
-        all_predictions = model.predict(X)
-        risk_labels = ['Low Risk', 'Medium Risk', 'High Risk']
-        
-        # Save ML results
-        ml_results = pd.DataFrame({
-            'Student_Name': student_names,
-            'Attendance_Rate': [f[0] for f in features],
-            'Grade_Level': [f[1] for f in features],
-            'Fee_Payment_Rate': [f[2] for f in features],
-            'Risk_Category': [risk_labels[pred] for pred in all_predictions]
-        })
-        
-        ml_results.to_excel('ml_model/student_risk_predictions.xlsx', index=False)
+        saved = write_report('ml_model/student_risk_predictions', {'Sheet1': ml_results}, self.formats)
         
         print(f"✅ ML Model trained successfully!")
         print(f"🎯 Model Accuracy: {accuracy:.2f}")
-        print(f"📊 Analyzed {len(features)} students")
-        print(f"📁 Results saved: ml_model/student_risk_predictions.xlsx")
+        print(f"📊 Analyzed {scored} students")
+        print(f"🗄️ Predictions stored in ml_predictions (phase3_student_risk v{meta['version']})")
+        print(f"📁 Results saved: {', '.join(saved)}")
+        if report.truncated:
+            print(f"⚠️ Excel report limited to the first {report.rows} students")
         
         # Display sample predictions
         print("\n📋 Sample Risk Predictions:")
-        for i in range(min(5, len(student_names))):
-            print(f"  👨‍🎓 {student_names[i]}: {risk_labels[all_predictions[i]]} (Attendance: {features[i][0]:.1f}%)")
+        for row in ml_results.head(5).itertuples(index=False):
+            print(f"  👨‍🎓 {row.Student_Name}: {row.Risk_Category} (Attendance: {row.Attendance_Rate:.1f}%)")
         
-        return accuracy, len(features)
+        return accuracy, scored
     
     def verify_all_requirements(self):
         """Verify all project requirements are fulfilled"""
         print("\n🔍 FINAL VERIFICATION - All Project Requirements...")
         
+        m = self.metrics.snapshot(self.connection)
+        
         # 1. School structure verification
-        schools = self.connection.execute("SELECT COUNT(*) FROM schools").fetchone()[0]
-        grades = self.connection.execute("SELECT COUNT(*) FROM grades").fetchone()[0]
-        sections = self.connection.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
-        print(f"🏫 School Structure: {schools} school, {grades} grades, {sections} sections ✅")
+        print(f"🏫 School Structure: {m['schools']} school, {m['grades']} grades, {m['sections']} sections ✅")
         
         # 2. People verification
-        students = self.connection.execute("SELECT COUNT(*) FROM students").fetchone()[0]
-        teachers = self.connection.execute("SELECT COUNT(*) FROM teachers").fetchone()[0]
-        print(f"👥 People: {students} students (10 per section), {teachers} teachers ✅")
+        print(f"👥 People: {m['students']} students (10 per section), {m['teachers']} teachers ✅")
         
         # 3. Attendance verification
-        total_attendance = self.connection.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
-        present_attendance = self.connection.execute("SELECT COUNT(*) FROM attendance WHERE status = 'Present'").fetchone()[0]
-        attendance_percentage = (present_attendance / total_attendance) * 100
-        print(f"📅 Attendance: {attendance_percentage:.1f}% school-wide (>80% required) ✅")
+        print(f"📅 Attendance: {m['attendance_rate']:.1f}% school-wide (>80% required) ✅")
         
         # 4. Homework verification
-        homework_count = self.connection.execute("SELECT COUNT(*) FROM homework").fetchone()[0]
-        homework_per_teacher = homework_count / 8
-        print(f"📚 Homework: {homework_count} assignments ({homework_per_teacher} per teacher) ✅")
+        homework_per_teacher = m['homework'] / 8
+        print(f"📚 Homework: {m['homework']} assignments ({homework_per_teacher} per teacher) ✅")
         
         # 5. Class diary verification
-        diary_count = self.connection.execute("SELECT COUNT(*) FROM class_diary").fetchone()[0]
-        diary_per_teacher = diary_count / 8
-        print(f"📖 Class Diary: {diary_count} entries ({diary_per_teacher} per teacher) ✅")
+        diary_per_teacher = m['diary_entries'] / 8
+        print(f"📖 Class Diary: {m['diary_entries']} entries ({diary_per_teacher} per teacher) ✅")
         
         # 6. Financial verification
-        fee_income = self.connection.execute("SELECT SUM(paid_amount) FROM fees").fetchone()[0]
-        salary_expense = self.connection.execute("SELECT SUM(net_salary) FROM salary").fetchone()[0]
-        print(f"💰 Finances: ₹{fee_income:,} income, ₹{salary_expense:,.2f} salary expenses ✅")
+        print(f"💰 Finances: ₹{m['fees_paid']:,} income, ₹{m['salary_expense']:,.2f} salary expenses ✅")
         
         # 7. ML Model verification
-        ml_file_exists = os.path.exists('ml_model/student_risk_predictions.xlsx')
+        ml_file_exists = report_exists('ml_model/student_risk_predictions')
         print(f"🤖 ML Model: {'Created' if ml_file_exists else 'Missing'} ✅")
         
         print(f"\n🎉 ALL REQUIREMENTS SUCCESSFULLY FULFILLED!")
         return True
 
-def main():
+def main(retrain=False, formats=('xlsx',)):
     print("=" * 80)
     print("🚀 PHASE 3: ADVANCED DATA GENERATION & ML MODEL")
     print("=" * 80)
     
-    processor = Phase3AdvancedData()
+    processor = Phase3AdvancedData(retrain=retrain, formats=formats)
     
     if not processor.connect_database():
         return False
@@ -495,4 +480,10 @@ def main():
     return True
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Phase 3: data generation and risk model")
+    parser.add_argument('--retrain', action='store_true',
+                        help="retrain the risk model instead of scoring with the registered version")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=['xlsx'],
+                        help="prediction file formats (default: xlsx; parquet needs pyarrow)")
+    args = parser.parse_args()
+    main(retrain=args.retrain, formats=args.formats)
@@ -1,15 +1,85 @@
 import sqlite3
 import pandas as pd
 import os
+import re
+import json
+import time
+import argparse
 from datetime import datetime
+from itertools import groupby
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 import matplotlib.pyplot as plt
 import seaborn as sns
+from batch_scoring import BatchScorer
+from school_metrics import SchoolMetrics, CORE_TABLES
+from change_tracking import ChangeTracker
+from financial_ledger import FinancialLedger
+from attendance_queries import AttendanceQuery, ensure_attendance_indexes, SUMMARY_COLUMNS
+from report_writer import StreamedQuery, write_report, resolve_formats, report_exists, written_reports, REPORT_FORMATS
+
+# Registered model whose stored predictions feed the student report
+RISK_MODEL_NAME = 'phase3_student_risk'
+
+# (label, builder, report name, runs on its own read-only connection in parallel mode)
+# The overview reads the metrics snapshot cached on the main connection, so it stays on the calling thread
+REPORT_STEPS = [
+    ('School Overview Report', '_create_school_overview_report', '01_school_overview', False),
+    ('Attendance Report', '_create_attendance_report', '02_attendance_report', True),
+    ('Financial Report', '_create_financial_report', '03_financial_report', True),
+    ('Teacher Report', '_create_teacher_report', '04_teacher_report', True),
+    ('Student Comprehensive Report with ML Predictions', '_create_student_report',
+     '05_student_comprehensive_report', True)
+]
+
+# Tables each report reads; a report is only rebuilt when one of them changed since its last build
+REPORT_SOURCES = {
+    '01_school_overview': ('schools', 'grades', 'sections', 'subjects', 'students', 'teachers',
+                           'attendance', 'fees'),
+    '02_attendance_report': ('students', 'grades', 'sections', 'attendance'),
+    '03_financial_report': ('fees', 'salary', 'teachers'),
+    '04_teacher_report': ('teachers', 'subjects', 'homework', 'class_diary', 'teacher_subjects'),
+    '05_student_comprehensive_report': ('students', 'grades', 'sections', 'attendance', 'fees', 'ml_predictions')
+}
+
+# Reports that also depend on the month they are built in (fee ageing); rebuilt when that month changes
+AS_OF_REPORTS = ('03_financial_report',)
+
+# Reports that can also be split into one set of files per school, grade or section
+SHARDED_REPORTS = [
+    ('Attendance Report', '_create_attendance_report', '02_attendance_report'),
+    ('Student Comprehensive Report with ML Predictions', '_create_student_report', '05_student_comprehensive_report')
+]
+
+# Shard key columns; school_id keeps the grades and sections of different schools apart
+SHARD_KEYS = {
+    'school': ('s.school_id',),
+    'grade': ('s.school_id', 'g.grade_name'),
+    'section': ('s.school_id', 'g.grade_name', 'sec.section_name')
+}
+
+# Source-table marks, formats and files of every report's last build, kept next to the reports
+BUILD_STATE_FILE = '.build_state.json'
+
+def current_month():
+    return datetime.now().strftime('%Y-%m')
+
+def _write_report(stem, sheets, formats, db_path):
+    """Process-pool job: write one report in every output format; returns (paths written, seconds)"""
+    start = time.perf_counter()
+    paths = write_report(stem, sheets, formats, db_path)
+    return paths, time.perf_counter() - start
 
 class Phase4FinalTesting:
-    def __init__(self):
+    def __init__(self, formats=('xlsx',)):
         self.db_path = 'school_management.db'
         self.connection = None
         self.reports_dir = 'reports'
+        self.metrics = SchoolMetrics(self.db_path)
+        self.report_timings = {}
+        self.formats = resolve_formats(formats)  # every report is written once per format
+        self.tracker = ChangeTracker(sorted({table for tables in REPORT_SOURCES.values() for table in tables}))
+        self.as_of_month = current_month()  # 'YYYY-MM' the financial report measures fee ageing from
         
     def connect_database(self):
         """Connect to database"""
@@ -21,31 +91,182 @@ class Phase4FinalTesting:
             print(f"❌ Database connection failed: {e}")
             return False
     
-    def create_comprehensive_reports(self):
-        """Generate comprehensive reports for all modules"""
+    def create_comprehensive_reports(self, parallel=False, workers=None, full=False):
+        """Generate the reports whose source tables changed (all with full=True), one after another or concurrently"""
         print("📊 Generating comprehensive reports...")
         
         # Create reports directory
         os.makedirs(self.reports_dir, exist_ok=True)
         
-        # 1. School Overview Report
-        self._create_school_overview_report()
-        
-        # 2. Attendance Report
-        self._create_attendance_report()
-        
-        # 3. Financial Report
-        self._create_financial_report()
-        
-        # 4. Teacher Performance Report
-        self._create_teacher_report()
-        
-        # 5. Student Performance Report
-        self._create_student_report()
-        
-        print(f"📊 All reports saved in: {os.path.abspath(self.reports_dir)}/")
-        
-    def _create_school_overview_report(self):
+        # The student report joins ml_predictions; create it here since parallel builders are read-only
+        BatchScorer.ensure_table(self.connection)
+        ensure_attendance_indexes(self.connection)
+        FinancialLedger().install(self.connection)  # read by the financial report
+        
+        # Marks are read before building, so writes made during the run trigger a rebuild next time
+        self.tracker.install(self.connection)
+        marks = self.tracker.marks(self.connection)
+        state = {} if full else self._read_build_state()
+        self.as_of_month = current_month()
+        
+        steps, sources, as_of = [], {}, {}
+        for step in REPORT_STEPS:
+            label, _, stem, _ = step
+            sources[stem] = {table: list(marks[table]) for table in REPORT_SOURCES[stem]}
+            as_of[stem] = self.as_of_month if stem in AS_OF_REPORTS else None
+            if self._is_current(state.get(stem), sources[stem], as_of[stem]):
+                print(f"♻️ {label} unchanged since {state[stem]['built_at']}")
+            else:
+                steps.append(step)
+        
+        wall_start = time.perf_counter()
+        if parallel and steps:
+            built = self._build_reports_in_parallel(steps, workers)
+        else:
+            built = {}
+            for label, method_name, stem, _ in steps:
+                query_start = time.perf_counter()
+                sheets = getattr(self, method_name)(self.connection)
+                query_time = time.perf_counter() - query_start
+                built[stem], encode_time = _write_report(os.path.join(self.reports_dir, stem), sheets,
+                                                         self.formats, self.db_path)
+                self.report_timings[label] = (query_time, encode_time)
+                print(f"✅ {label}")
+        self._print_report_timings(time.perf_counter() - wall_start)
+        
+        built_at = datetime.now().isoformat(sep=' ', timespec='seconds')
+        for stem, paths in built.items():
+            state[stem] = {'sources': sources[stem], 'as_of': as_of[stem], 'formats': list(self.formats),
+                           'paths': paths, 'built_at': built_at}
+        self._write_build_state(state)
+        
+        print(f"📊 {len(built)} of {len(REPORT_STEPS)} reports rebuilt, all saved in: "
+              f"{os.path.abspath(self.reports_dir)}/")
+    
+    def _is_current(self, build, sources, as_of=None):
+        """True when a previous build read the same table marks, as of the same month, and its files cover the
+        requested formats"""
+        return (build is not None and build['sources'] == sources and build.get('as_of') == as_of
+                and set(self.formats) <= set(build['formats'])
+                and all(os.path.exists(path) for path in build['paths']))
+    
+    def _read_build_state(self):
+        path = os.path.join(self.reports_dir, BUILD_STATE_FILE)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Ignoring unreadable report build state: {e}")
+            return {}
+    
+    def _write_build_state(self, state):
+        path = os.path.join(self.reports_dir, BUILD_STATE_FILE)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(state, file, indent=2)
+        os.replace(f"{path}.tmp", path)
+    
+    def _query_report(self, method_name):
+        """Thread-pool job: run one builder on its own read-only connection"""
+        start = time.perf_counter()
+        connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, timeout=30)
+        try:
+            sheets = getattr(self, method_name)(connection)
+        finally:
+            connection.close()
+        return sheets, time.perf_counter() - start
+    
+    def _build_reports_in_parallel(self, steps, workers=None):
+        """Queries on threads (SQLite releases the GIL), file encoding in worker processes; returns {report: paths}"""
+        workers = workers or len(steps)
+        print(f"⚙️ Building {len(steps)} reports on {workers} threads and {workers} processes")
+        
+        encodings, query_times = {}, {}
+        with ProcessPoolExecutor(max_workers=workers) as processes:
+            # The pool forks all its workers on the first submit; do that before any query thread starts
+            processes.submit(os.getpid).result()
+            
+            def encode(label, stem, sheets):
+                path = os.path.join(self.reports_dir, stem)
+                encodings[label] = processes.submit(_write_report, path, sheets, self.formats, self.db_path)
+            
+            with ThreadPoolExecutor(max_workers=workers) as threads:
+                queries = {threads.submit(self._query_report, method_name): (label, stem)
+                           for label, method_name, stem, threaded in steps if threaded}
+                
+                # Reports on the main connection are built here while the threads run
+                for label, method_name, stem, threaded in steps:
+                    if not threaded:
+                        query_start = time.perf_counter()
+                        sheets = getattr(self, method_name)(self.connection)
+                        query_times[label] = time.perf_counter() - query_start
+                        encode(label, stem, sheets)
+                
+                # Hand each report to the process pool as soon as its data is ready
+                for future in as_completed(queries):
+                    label, stem = queries[future]
+                    sheets, query_times[label] = future.result()
+                    encode(label, stem, sheets)
+            
+            built = {}
+            for label, _, stem, _ in steps:
+                built[stem], encode_time = encodings[label].result()
+                self.report_timings[label] = (query_times[label], encode_time)
+                print(f"✅ {label}")
+        return built
+    
+    def _print_report_timings(self, total_wall):
+        print("\n⏱️ Report timings:")
+        for label, (query_time, encode_time) in self.report_timings.items():
+            # Streamed reports run their query while writing, so it counts towards the write time
+            print(f"  {label}: query {query_time:.2f}s, write {encode_time:.2f}s ({', '.join(self.formats)})")
+        print(f"  Total wall clock: {total_wall:.2f}s "
+              f"(sum of report times {sum(q + e for q, e in self.report_timings.values()):.2f}s)")
+        
+    def create_sharded_reports(self, by='section', workers=None):
+        """Write the attendance and student reports once per school, grade or section under reports/by_<by>/"""
+        print(f"🗂️ Generating per-{by} reports...")
+        shard_keys = SHARD_KEYS[by]
+        shard_root = os.path.join(self.reports_dir, f"by_{by}")
+        workers = workers or os.cpu_count() or 1
+        BatchScorer.ensure_table(self.connection)
+        ensure_attendance_indexes(self.connection)
+        
+        wall_start = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as processes:
+            for label, method_name, stem in SHARDED_REPORTS:
+                query_start = time.perf_counter()
+                (query,) = getattr(self, method_name)(self.connection, shard_keys).values()
+                
+                # One query per report, partitioned as it streams: every run of equal keys is one shard
+                rows = (row for batch in query.batches(self.connection) for row in batch)
+                pending, write_times, shards = deque(), [], 0
+                for key, group in groupby(rows, key=lambda row: row[:len(shard_keys)]):
+                    shard = pd.DataFrame([row[len(shard_keys):] for row in group], columns=query.columns)
+                    folder = os.path.join(shard_root, self._shard_name(key))
+                    os.makedirs(folder, exist_ok=True)
+                    pending.append(processes.submit(_write_report, os.path.join(folder, stem), {'Sheet1': shard},
+                                                    self.formats, self.db_path))
+                    shards += 1
+                    # Bound the shards waiting in memory when writing falls behind the query
+                    while len(pending) >= 2 * workers:
+                        write_times.append(pending.popleft().result()[1])
+                query_time = time.perf_counter() - query_start
+                write_times += [future.result()[1] for future in pending]
+                print(f"✅ {label}: {shards} {by} shards (query {query_time:.2f}s, write {sum(write_times):.2f}s)")
+        
+        print(f"  Total wall clock: {time.perf_counter() - wall_start:.2f}s on {workers} processes")
+        print(f"🗂️ Shards saved in: {os.path.abspath(shard_root)}/")
+    
+    @staticmethod
+    def _shard_name(key):
+        """Folder of one shard, e.g. school_1-Grade_6-A"""
+        school_id, *names = key
+        return '-'.join([f"school_{school_id}"] + [re.sub(r'[^A-Za-z0-9]+', '_', str(name)).strip('_')
+                                                   for name in names])
+    
+    def _create_school_overview_report(self, connection):
         """Create comprehensive school overview"""
         overview_data = {
             'Metric': [
@@ -57,81 +278,69 @@ class Phase4FinalTesting:
         }
         
         # Calculate metrics
-        schools = self.connection.execute("SELECT COUNT(*) FROM schools").fetchone()[0]
-        grades = self.connection.execute("SELECT COUNT(*) FROM grades").fetchone()[0]
-        sections = self.connection.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
-        students = self.connection.execute("SELECT COUNT(*) FROM students").fetchone()[0]
-        teachers = self.connection.execute("SELECT COUNT(*) FROM teachers").fetchone()[0]
-        subjects = self.connection.execute("SELECT COUNT(*) FROM subjects").fetchone()[0]
-        
-        student_teacher_ratio = students / teachers
-        avg_class_size = students / sections
-        
-        # Attendance rate
-        total_att = self.connection.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
-        present_att = self.connection.execute("SELECT COUNT(*) FROM attendance WHERE status = 'Present'").fetchone()[0]
-        attendance_rate = (present_att / total_att) * 100
-        
-        # Fee collection rate
-        total_fees = self.connection.execute("SELECT SUM(amount) FROM fees").fetchone()[0]
-        paid_fees = self.connection.execute("SELECT SUM(paid_amount) FROM fees").fetchone()[0]
-        fee_collection_rate = (paid_fees / total_fees) * 100
+        m = self.metrics.snapshot(connection)
         
         overview_data['Value'] = [
-            schools, grades, sections, students, teachers, subjects,
-            f"{student_teacher_ratio:.1f}:1", f"{avg_class_size:.1f}", 
-            f"{attendance_rate:.1f}%", f"{fee_collection_rate:.1f}%"
+            m['schools'], m['grades'], m['sections'], m['students'], m['teachers'], m['subjects'],
+            f"{m['student_teacher_ratio']:.1f}:1", f"{m['avg_class_size']:.1f}", 
+            f"{m['attendance_rate']:.1f}%", f"{m['fee_collection_rate']:.1f}%"
         ]
         
         df = pd.DataFrame(overview_data)
-        df.to_excel(f'{self.reports_dir}/01_school_overview.xlsx', index=False)
-        print("✅ School Overview Report")
-        
-    def _create_attendance_report(self):
-        """Create detailed attendance analysis"""
-        attendance_data = self.connection.execute("""
+        return {'Sheet1': df}
+        
+    def _create_attendance_report(self, connection, shard_keys=(), query=None):
+        """Create detailed attendance analysis, optionally for an AttendanceQuery's slice only"""
+        # One row per student: streamed to the workbook rather than loaded into a DataFrame
+        # Shard keys lead every row and the ordering, so each shard arrives as one contiguous run
+        shard_columns = ''.join(f"{key}, " for key in shard_keys)
+        sql, params = (query or AttendanceQuery()).summary_sql(shard_columns)
+        attendance_query = StreamedQuery(sql, columns=SUMMARY_COLUMNS, params=params)
+        
+        return {'Sheet1': attendance_query}
+        
+    def _create_financial_report(self, connection, as_of_month=None):
+        """Create comprehensive financial report, with fee ageing as of `as_of_month` (default self.as_of_month)"""
+        as_of_month = as_of_month or self.as_of_month
+        # Fee collection summary, from the monthly ledger that triggers keep current
+        fee_summary = connection.execute("""
             SELECT 
-                s.student_name,
-                g.grade_name,
-                sec.section_name,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present_days,
-                COUNT(a.attendance_id) as total_days,
-                ROUND((COUNT(CASE WHEN a.status = 'Present' THEN 1 END) * 100.0 / COUNT(a.attendance_id)), 2) as attendance_percentage
-            FROM students s
-            JOIN grades g ON s.grade_id = g.grade_id
-            JOIN sections sec ON s.section_id = sec.section_id
-            LEFT JOIN attendance a ON s.student_id = a.student_id
-            GROUP BY s.student_id, s.student_name, g.grade_name, sec.section_name
-            ORDER BY attendance_percentage DESC
+                account,
+                SUM(records) as total_students,
+                SUM(fees_due) as total_amount_due,
+                SUM(fees_paid) as total_amount_paid,
+                SUM(outstanding) as outstanding_amount
+            FROM financial_ledger
+            WHERE teacher_id = 0
+            GROUP BY account
         """).fetchall()
         
-        df = pd.DataFrame(attendance_data, columns=[
-            'Student_Name', 'Grade', 'Section', 'Present_Days', 'Total_Days', 'Attendance_Percentage'
+        fee_df = pd.DataFrame(fee_summary, columns=[
+            'Fee_Type', 'Total_Students', 'Amount_Due', 'Amount_Paid', 'Outstanding'
         ])
         
-        df.to_excel(f'{self.reports_dir}/02_attendance_report.xlsx', index=False)
-        print("✅ Attendance Report")
+        # Income vs expense per month
+        monthly_df = FinancialLedger.monthly(connection)
         
-    def _create_financial_report(self):
-        """Create comprehensive financial report"""
-        # Fee collection summary
-        fee_summary = self.connection.execute("""
+        # Outstanding dues by how many months before the as-of month they fell due
+        ageing = connection.execute("""
             SELECT 
-                fee_type,
-                COUNT(*) as total_students,
-                SUM(amount) as total_amount_due,
-                SUM(paid_amount) as total_amount_paid,
-                SUM(amount - paid_amount) as outstanding_amount
-            FROM fees
-            GROUP BY fee_type
-        """).fetchall()
-        
-        fee_df = pd.DataFrame(fee_summary, columns=[
-            'Fee_Type', 'Total_Students', 'Amount_Due', 'Amount_Paid', 'Outstanding'
-        ])
+                account,
+                month,
+                outstanding,
+                (CAST(substr(:as_of, 1, 4) AS INTEGER) * 12 + CAST(substr(:as_of, 6, 2) AS INTEGER))
+                    - (CAST(substr(month, 1, 4) AS INTEGER) * 12 + CAST(substr(month, 6, 2) AS INTEGER)) as months_overdue,
+                :as_of
+            FROM financial_ledger
+            WHERE teacher_id = 0 AND outstanding > 0
+            ORDER BY month, account
+        """, {'as_of': as_of_month}).fetchall()
+        
+        ageing_df = pd.DataFrame(ageing, columns=['Fee_Type', 'Due_Month', 'Outstanding', 'Months_Overdue',
+                                                  'As_Of_Month'])
         
         # Salary summary
-        salary_summary = self.connection.execute("""
+        salary_summary = connection.execute("""
             SELECT 
                 t.teacher_name,
                 s.month,
@@ -149,16 +358,13 @@ class Phase4FinalTesting:
             'Teacher_Name', 'Month', 'Year', 'Basic_Salary', 'Allowances', 'Deductions', 'Net_Salary'
         ])
         
-        # Save both sheets in one Excel file
-        with pd.ExcelWriter(f'{self.reports_dir}/03_financial_report.xlsx') as writer:
-            fee_df.to_excel(writer, sheet_name='Fee_Collection', index=False)
-            salary_df.to_excel(writer, sheet_name='Salary_Details', index=False)
+        # All sheets go in one report
+        return {'Fee_Collection': fee_df, 'Monthly_Ledger': monthly_df, 'Outstanding_Ageing': ageing_df,
+                'Salary_Details': salary_df}
         
-        print("✅ Financial Report")
-        
-    def _create_teacher_report(self):
+    def _create_teacher_report(self, connection):
         """Create teacher performance and activity report"""
-        teacher_data = self.connection.execute("""
+        teacher_data = connection.execute("""
             SELECT 
                 t.teacher_name,
                 t.employee_id,
@@ -180,49 +386,56 @@ class Phase4FinalTesting:
             'Homework_Assigned', 'Diary_Entries', 'Classes_Assigned'
         ])
         
-        df.to_excel(f'{self.reports_dir}/04_teacher_report.xlsx', index=False)
-        print("✅ Teacher Report")
+        return {'Sheet1': df}
         
-    def _create_student_report(self):
+    def _create_student_report(self, connection, shard_keys=()):
         """Create comprehensive student report with ML predictions"""
-        # Load ML predictions
-        ml_predictions = pd.read_excel('ml_model/student_risk_predictions.xlsx')
-        
-        # Get student details
-        student_data = self.connection.execute("""
-            SELECT 
+        # Predictions live in ml_predictions (written by run_phase3.py); use the newest scored model version
+        # Attendance and fees are aggregated separately so neither multiplies the other
+        shard_columns = ''.join(f"{key}, " for key in shard_keys)
+        student_query = StreamedQuery(f"""
+            SELECT {shard_columns}
                 s.student_name,
                 s.student_roll,
                 g.grade_name,
                 sec.section_name,
                 s.parent_name,
                 s.parent_phone,
-                COUNT(CASE WHEN a.status = 'Present' THEN 1 END) as present_days,
-                COUNT(a.attendance_id) as total_days,
-                SUM(f.paid_amount) as fees_paid
+                COALESCE(a.present_days, 0) as present_days,
+                COALESCE(a.total_days, 0) as total_days,
+                f.fees_paid,
+                p.predicted_label as risk_category
             FROM students s
             JOIN grades g ON s.grade_id = g.grade_id
             JOIN sections sec ON s.section_id = sec.section_id
-            LEFT JOIN attendance a ON s.student_id = a.student_id
-            LEFT JOIN fees f ON s.student_id = f.student_id
-            GROUP BY s.student_id
-            ORDER BY g.grade_name, sec.section_name, s.student_roll
-        """).fetchall()
-        
-        student_df = pd.DataFrame(student_data, columns=[
+            LEFT JOIN (
+                SELECT student_id,
+                       COUNT(CASE WHEN status = 'Present' THEN 1 END) as present_days,
+                       COUNT(*) as total_days
+                FROM attendance
+                GROUP BY student_id
+            ) a ON s.student_id = a.student_id
+            LEFT JOIN (
+                SELECT student_id, SUM(paid_amount) as fees_paid
+                FROM fees
+                GROUP BY student_id
+            ) f ON s.student_id = f.student_id
+            LEFT JOIN ml_predictions p
+                ON p.student_id = s.student_id
+                AND p.model_name = ?
+                AND p.model_version = (SELECT MAX(model_version) FROM ml_predictions WHERE model_name = ?)
+            ORDER BY {shard_columns}g.grade_name, sec.section_name, s.student_roll
+        """, params=(RISK_MODEL_NAME, RISK_MODEL_NAME), columns=[
             'Student_Name', 'Roll_Number', 'Grade', 'Section', 'Parent_Name', 
-            'Parent_Phone', 'Present_Days', 'Total_Days', 'Fees_Paid'
+            'Parent_Phone', 'Present_Days', 'Total_Days', 'Fees_Paid', 'Risk_Category'
         ])
         
-        # Merge with ML predictions
-        final_report = student_df.merge(
-            ml_predictions[['Student_Name', 'Risk_Category']], 
-            on='Student_Name', 
-            how='left'
-        )
+        scored = connection.execute("SELECT EXISTS(SELECT 1 FROM ml_predictions WHERE model_name = ?)",
+                                    (RISK_MODEL_NAME,)).fetchone()[0]
+        if not scored:
+            print(f"⚠️ No stored {RISK_MODEL_NAME} predictions - run run_phase3.py to score students")
         
-        final_report.to_excel(f'{self.reports_dir}/05_student_comprehensive_report.xlsx', index=False)
-        print("✅ Student Comprehensive Report with ML Predictions")
+        return {'Sheet1': student_query}
     
     def create_project_summary(self):
         """Create final project summary and statistics"""
@@ -239,26 +452,20 @@ class Phase4FinalTesting:
         }
         
         # Calculate all metrics
-        tables = len(self.connection.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall())
+        m = self.metrics.snapshot(self.connection)
         excel_files = len([f for f in os.listdir('sample_data') if f.endswith('.xlsx')])
-        students = self.connection.execute("SELECT COUNT(*) FROM students").fetchone()[0]
-        teachers = self.connection.execute("SELECT COUNT(*) FROM teachers").fetchone()[0]
-        attendance = self.connection.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
-        homework = self.connection.execute("SELECT COUNT(*) FROM homework").fetchone()[0]
-        diary = self.connection.execute("SELECT COUNT(*) FROM class_diary").fetchone()[0]
-        fees = self.connection.execute("SELECT COUNT(*) FROM fees").fetchone()[0]
-        salary = self.connection.execute("SELECT COUNT(*) FROM salary").fetchone()[0]
-        reports = len([f for f in os.listdir(self.reports_dir) if f.endswith('.xlsx')])
+        reports = len(written_reports(self.reports_dir))
         
-        total_data_points = attendance + homework + diary + fees + salary + students + teachers
+        total_data_points = (m['attendance_records'] + m['homework'] + m['diary_entries'] + m['fee_records']
+                             + m['salary_records'] + m['students'] + m['teachers'])
         
         summary['Count/Value'] = [
-            tables, excel_files, students, teachers, attendance, homework,
-            diary, fees, salary, "100%", reports, total_data_points
+            m['tables'], excel_files, m['students'], m['teachers'], m['attendance_records'], m['homework'],
+            m['diary_entries'], m['fee_records'], m['salary_records'], "100%", reports, total_data_points
         ]
         
         summary_df = pd.DataFrame(summary)
-        summary_df.to_excel(f'{self.reports_dir}/00_PROJECT_SUMMARY.xlsx', index=False)
+        write_report(f'{self.reports_dir}/00_PROJECT_SUMMARY', {'Sheet1': summary_df}, self.formats)
         print("✅ Project Summary Created")
         
         return summary_df
@@ -269,11 +476,11 @@ class Phase4FinalTesting:
         
         tests_passed = 0
         total_tests = 8
+        m = self.metrics.snapshot(self.connection)
         
         # Test 1: Database integrity
         try:
-            tables = self.connection.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
-            assert len(tables) == 12
+            assert m['core_tables'] == len(CORE_TABLES)
             print("✅ Test 1: Database integrity")
             tests_passed += 1
         except:
@@ -281,8 +488,7 @@ class Phase4FinalTesting:
         
         # Test 2: Student count
         try:
-            student_count = self.connection.execute("SELECT COUNT(*) FROM students").fetchone()[0]
-            assert student_count == 60
+            assert m['students'] == 60
             print("✅ Test 2: Student count (60)")
             tests_passed += 1
         except:
@@ -290,8 +496,7 @@ class Phase4FinalTesting:
         
         # Test 3: Teacher count
         try:
-            teacher_count = self.connection.execute("SELECT COUNT(*) FROM teachers").fetchone()[0]
-            assert teacher_count == 8
+            assert m['teachers'] == 8
             print("✅ Test 3: Teacher count (8)")
             tests_passed += 1
         except:
@@ -299,9 +504,7 @@ class Phase4FinalTesting:
         
         # Test 4: Attendance percentage
         try:
-            total_att = self.connection.execute("SELECT COUNT(*) FROM attendance").fetchone()[0]
-            present_att = self.connection.execute("SELECT COUNT(*) FROM attendance WHERE status = 'Present'").fetchone()[0]
-            attendance_rate = (present_att / total_att) * 100
+            attendance_rate = m['attendance_rate']
             assert attendance_rate > 80
             print(f"✅ Test 4: Attendance >80% ({attendance_rate:.1f}%)")
             tests_passed += 1
@@ -310,8 +513,7 @@ class Phase4FinalTesting:
         
         # Test 5: Homework per teacher
         try:
-            homework_count = self.connection.execute("SELECT COUNT(*) FROM homework").fetchone()[0]
-            assert homework_count == 24  # 3 per teacher
+            assert m['homework'] == 24  # 3 per teacher
             print("✅ Test 5: Homework assignments (3 per teacher)")
             tests_passed += 1
         except:
@@ -319,8 +521,7 @@ class Phase4FinalTesting:
         
         # Test 6: Class diary per teacher
         try:
-            diary_count = self.connection.execute("SELECT COUNT(*) FROM class_diary").fetchone()[0]
-            assert diary_count == 16  # 2 per teacher
+            assert m['diary_entries'] == 16  # 2 per teacher
             print("✅ Test 6: Class diary entries (2 per teacher)")
             tests_passed += 1
         except:
@@ -328,7 +529,7 @@ class Phase4FinalTesting:
         
         # Test 7: ML model file exists
         try:
-            assert os.path.exists('ml_model/student_risk_predictions.xlsx')
+            assert report_exists('ml_model/student_risk_predictions')
             print("✅ Test 7: ML model file exists")
             tests_passed += 1
         except:
@@ -336,8 +537,7 @@ class Phase4FinalTesting:
         
         # Test 8: Reports generated
         try:
-            report_files = [f for f in os.listdir(self.reports_dir) if f.endswith('.xlsx')]
-            assert len(report_files) >= 5
+            assert len(written_reports(self.reports_dir)) >= 5
             print("✅ Test 8: Reports generated")
             tests_passed += 1
         except:
@@ -346,18 +546,20 @@ class Phase4FinalTesting:
         print(f"\n🧪 Tests Summary: {tests_passed}/{total_tests} passed")
         return tests_passed == total_tests
 
-def main():
+def main(parallel=False, workers=None, formats=('xlsx',), full=False, shard_by=None):
     print("=" * 90)
     print("🏁 PHASE 4: FINAL TESTING, REPORTS & PROJECT COMPLETION")
     print("=" * 90)
     
-    processor = Phase4FinalTesting()
+    processor = Phase4FinalTesting(formats=formats)
     
     if not processor.connect_database():
         return False
     
     # Step 1: Generate comprehensive reports
-    processor.create_comprehensive_reports()
+    processor.create_comprehensive_reports(parallel=parallel, workers=workers, full=full)
+    if shard_by:
+        processor.create_sharded_reports(by=shard_by, workers=workers)
     
     # Step 2: Create project summary
     summary_df = processor.create_project_summary()
@@ -390,4 +592,16 @@ def main():
     return True
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate final reports and run the system tests")
+    parser.add_argument('--parallel', action='store_true',
+                        help="build the independent reports concurrently, encoding files in a process pool")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="threads and processes for --parallel (default: one per report) and --shard-by (default: all CPUs)")
+    parser.add_argument('--formats', nargs='+', choices=REPORT_FORMATS, default=['xlsx'],
+                        help="report file formats (default: xlsx; parquet needs pyarrow)")
+    parser.add_argument('--full', action='store_true',
+                        help="rebuild every report, even those whose source tables did not change")
+    parser.add_argument('--shard-by', choices=list(SHARD_KEYS), default=None,
+                        help="also write the attendance and student reports per school, grade or section")
+    args = parser.parse_args()
+    main(parallel=args.parallel, workers=args.workers, formats=args.formats, full=args.full, shard_by=args.shard_by)
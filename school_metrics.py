@@ -0,0 +1,87 @@
+import sqlite3
+import threading
+
+# The 12 tables created by setup_database.py / fix_database.py
+CORE_TABLES = ('schools', 'grades', 'sections', 'subjects', 'teachers', 'students', 'teacher_subjects',
+               'attendance', 'homework', 'class_diary', 'fees', 'salary')
+
+
+class SchoolMetrics:
+    """Headline school metrics from one consolidated query, cached until the database changes"""
+
+    def __init__(self, db_path='school_management.db'):
+        self.db_path = db_path
+        self._cached = None  # (cache key, metrics)
+        self._watcher = None  # idle read-only connection; its data_version moves whenever anything commits
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def data_version(connection):
+        """Changes whenever this connection or any other one commits to the database"""
+        return connection.execute("PRAGMA data_version").fetchone()[0], connection.total_changes
+
+    def _query(self, connection):
+        # A single statement reads one consistent snapshot; attendance, fees and salary are scanned once each
+        core_tables = ','.join('?' * len(CORE_TABLES))
+        row = connection.execute(f"""
+            SELECT
+                (SELECT COUNT(*) FROM schools),
+                (SELECT COUNT(*) FROM grades),
+                (SELECT COUNT(*) FROM sections),
+                (SELECT COUNT(*) FROM subjects),
+                (SELECT COUNT(*) FROM students),
+                (SELECT COUNT(*) FROM teachers),
+                a.records, a.present,
+                (SELECT COUNT(*) FROM homework),
+                (SELECT COUNT(*) FROM class_diary),
+                f.records, f.due, f.paid,
+                s.records, s.expense,
+                (SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({core_tables}))
+            FROM (SELECT COUNT(*) as records, COALESCE(SUM(status = 'Present'), 0) as present FROM attendance) a,
+                 (SELECT COUNT(*) as records, COALESCE(SUM(amount), 0) as due,
+                         COALESCE(SUM(paid_amount), 0) as paid FROM fees) f,
+                 (SELECT COUNT(*) as records, COALESCE(SUM(net_salary), 0) as expense FROM salary) s
+        """, CORE_TABLES).fetchone()
+
+        keys = ['schools', 'grades', 'sections', 'subjects', 'students', 'teachers',
+                'attendance_records', 'present_records', 'homework', 'diary_entries',
+                'fee_records', 'fees_due', 'fees_paid', 'salary_records', 'salary_expense',
+                'core_tables']
+        metrics = dict(zip(keys, row))
+        # Only the school's own tables count; change_log, ml_predictions, financial_ledger etc. depend on which
+        # scripts have run
+        metrics['tables'] = metrics['core_tables']
+
+        def ratio(numerator, denominator, scale=1):
+            return numerator * scale / denominator if denominator else 0.0
+
+        metrics['attendance_rate'] = ratio(metrics['present_records'], metrics['attendance_records'], 100)
+        metrics['fee_collection_rate'] = ratio(metrics['fees_paid'], metrics['fees_due'], 100)
+        metrics['student_teacher_ratio'] = ratio(metrics['students'], metrics['teachers'])
+        metrics['avg_class_size'] = ratio(metrics['students'], metrics['sections'])
+        return metrics
+
+    def _database_version(self):
+        """data_version of our own watcher connection (values from different connections are not comparable)"""
+        if self._watcher is None:
+            self._watcher = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def snapshot(self, connection=None):
+        """Every headline metric as a dict; repeated calls reuse it until the database changes"""
+        with self._lock:
+            # total_changes covers the caller's own uncommitted writes, which only its connection can see
+            key = (self.db_path, self._database_version(), connection.total_changes if connection else None)
+            if self._cached is not None and self._cached[0] == key:
+                return self._cached[1]
+
+            if connection is not None:
+                metrics = self._query(connection)
+            else:
+                connection = sqlite3.connect(self.db_path)
+                try:
+                    metrics = self._query(connection)
+                finally:
+                    connection.close()
+            self._cached = (key, metrics)
+            return metrics
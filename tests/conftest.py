@@ -0,0 +1,16 @@
+import os
+import sys
+import shutil
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+
+@pytest.fixture
+def school_db(tmp_path, monkeypatch):
+    """A private copy of the sample database, with the test's working directory next to it"""
+    path = tmp_path / 'school_management.db'
+    shutil.copy(os.path.join(REPO_ROOT, 'school_management.db'), path)
+    monkeypatch.chdir(tmp_path)
+    return str(path)
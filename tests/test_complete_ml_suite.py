@@ -0,0 +1,21 @@
+import os
+import sys
+import sqlite3
+import subprocess
+from conftest import REPO_ROOT
+
+
+def test_parallel_suite_runs_end_to_end(school_db):
+    # Model 3 writes ml_predictions while the other workers read on their own read-only connections
+    result = subprocess.run(
+        [sys.executable, os.path.join(REPO_ROOT, 'complete_ml_suite.py'), '--parallel', '--formats', 'csv'],
+        capture_output=True, text=True, timeout=600
+    )
+    assert result.returncode == 0, result.stdout[-2000:] + result.stderr[-2000:]
+    assert 'COMPREHENSIVE ML SUITE COMPLETED' in result.stdout
+
+    connection = sqlite3.connect(school_db)
+    try:
+        assert connection.execute("SELECT COUNT(*) FROM ml_predictions").fetchone()[0] > 0
+    finally:
+        connection.close()
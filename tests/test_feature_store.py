@@ -0,0 +1,21 @@
+import sqlite3
+from feature_store import StudentFeatureStore
+
+
+def test_read_only_load_does_not_block_writers(school_db, tmp_path):
+    # Indexes and change counters already installed by a writable connection, as in complete_ml_suite --parallel
+    StudentFeatureStore(school_db, cache_path=str(tmp_path / 'features.pkl')).load()
+
+    reader = sqlite3.connect(f"file:{school_db}?mode=ro", uri=True)
+    try:
+        StudentFeatureStore(school_db, cache_path=str(tmp_path / 'features.pkl')).load(reader)
+        assert not reader.in_transaction
+
+        writer = sqlite3.connect(school_db, timeout=1)
+        try:
+            writer.execute("UPDATE fees SET paid_amount = paid_amount WHERE rowid = (SELECT MIN(rowid) FROM fees)")
+            writer.commit()
+        finally:
+            writer.close()
+    finally:
+        reader.close()
@@ -0,0 +1,27 @@
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from model_registry import ModelRegistry
+
+FEATURES = ['attendance_rate', 'grade_level', 'fee_payment_rate']
+
+
+def _fit_or_load(registry, X, y, **kwargs):
+    return registry.fit_or_load('risk', RandomForestClassifier(n_estimators=5, random_state=42), X, y, FEATURES,
+                                ('accuracy', accuracy_score), **kwargs)
+
+
+def test_fit_or_load_retrains_only_on_request_or_changed_data(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    rng = np.random.default_rng(0)
+    X, y = rng.random((40, 3)), np.tile([0, 1], 20)
+
+    _fit_or_load(registry, X, y)
+    _fit_or_load(registry, X, y)
+    assert registry.versions('risk') == [1]
+
+    _fit_or_load(registry, X, y, retrain=True)
+    assert registry.versions('risk') == [1, 2]
+
+    _fit_or_load(registry, np.vstack([X, rng.random((1, 3))]), np.append(y, 1))
+    assert registry.versions('risk') == [1, 2, 3]
@@ -0,0 +1,21 @@
+import sqlite3
+from unittest import mock
+from school_metrics import SchoolMetrics
+
+
+def test_default_snapshot_is_cached_until_the_database_changes(school_db):
+    metrics = SchoolMetrics(school_db)
+    with mock.patch.object(metrics, '_query', wraps=metrics._query) as query:
+        first = metrics.snapshot()
+        assert metrics.snapshot() is first
+        assert query.call_count == 1
+
+        writer = sqlite3.connect(school_db)
+        try:
+            writer.execute("DELETE FROM homework WHERE rowid = (SELECT MIN(rowid) FROM homework)")
+            writer.commit()
+        finally:
+            writer.close()
+
+        assert metrics.snapshot()['homework'] == first['homework'] - 1
+        assert query.call_count == 2
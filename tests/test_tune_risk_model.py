@@ -0,0 +1,11 @@
+import numpy as np
+from tune_risk_model import RiskModelTuner
+
+
+def test_folds_with_labels_not_starting_at_zero():
+    # student_risk labels are often only Medium (1) and High (2) risk
+    y = np.array([1] * 49 + [2] * 11)
+    folds = RiskModelTuner(n_folds=5)._folds(y)
+    assert len(folds) == 5
+    for _, test_idx in folds:
+        assert set(y[test_idx]) == {1, 2}
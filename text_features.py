@@ -0,0 +1,48 @@
+import re
+import numpy as np
+import pandas as pd
+
+# Default lexicons used by Model 4
+DIARY_LEXICONS = {
+    'positive': ['good', 'excellent', 'understanding', 'participated', 'active', 'engaged'],
+    'negative': ['poor', 'need', 'difficult', 'confused', 'absent', 'distracted']
+}
+TOPIC_LEXICONS = {
+    'complexity': ['advanced', 'complex', 'difficult', 'algebra', 'geometry', 'calculus']
+}
+
+
+class KeywordScorer:
+    """Counts lexicon terms found in whole text columns with one compiled regex"""
+
+    def __init__(self, lexicons):
+        self.lexicons = {name: [term.lower() for term in terms] for name, terms in lexicons.items()}
+        terms = sorted({term for lexicon in self.lexicons.values() for term in lexicon}, key=len, reverse=True)
+
+        # Membership of every term in every lexicon (a term may sit in several lexicons)
+        self.term_vectors = {
+            term: np.array([term in lexicon for lexicon in self.lexicons.values()], dtype=np.int64)
+            for term in terms
+        }
+        # A matched term also implies every shorter term it contains (substring semantics)
+        self.contained = {term: frozenset(other for other in terms if other in term) for term in terms}
+
+        # Longest terms first; the lookahead reports a match at every start position
+        alternation = '|'.join(re.escape(term) for term in terms)
+        self.pattern = re.compile(f"(?=({alternation}))", re.IGNORECASE) if terms else None
+
+    def score(self, texts):
+        """Number of distinct terms from each lexicon found in each text, as a DataFrame"""
+        texts = pd.Series(texts, dtype=object)
+        codes, uniques = pd.factorize(texts.fillna('').astype(str))
+
+        # Repeated texts (templated remarks, recurring topics) are scored once
+        table = np.zeros((len(uniques), len(self.lexicons)), dtype=np.int64)
+        if self.pattern is not None:
+            for row, text in enumerate(uniques):
+                found = {match.lower() for match in self.pattern.findall(text)}
+                if found:
+                    for term in frozenset().union(*(self.contained[match] for match in found)):
+                        table[row] += self.term_vectors[term]
+
+        return pd.DataFrame(table[codes], index=texts.index, columns=list(self.lexicons))
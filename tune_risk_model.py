@@ -0,0 +1,183 @@
+import os
+import json
+import math
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import StratifiedKFold, train_test_split
+from sklearn.metrics import accuracy_score
+from feature_store import StudentFeatureStore, RISK_MODEL_FEATURES
+from model_registry import ModelRegistry
+from complete_ml_suite import risk_training_data
+from run_phase3 import phase3_risk_training_data, PHASE3_RISK_FEATURES
+
+# Registry name -> (function building (X, y) from the feature store, names of the columns of X)
+TUNING_TARGETS = {
+    'student_risk': (risk_training_data, RISK_MODEL_FEATURES),
+    'phase3_student_risk': (phase3_risk_training_data, PHASE3_RISK_FEATURES)
+}
+
+PARAM_GRID = {
+    'max_depth': [None, 3, 5, 8],
+    'min_samples_leaf': [1, 2, 4],
+    'max_features': ['sqrt', None],
+    'class_weight': [None, 'balanced']
+}
+
+_worker_data = {}
+
+
+def _init_worker(X, y):
+    _worker_data['X'], _worker_data['y'] = X, y
+
+
+def _score_fold(params, n_estimators, train_idx, test_idx):
+    """Process-pool job: fit one candidate on one fold and return its accuracy"""
+    X, y = _worker_data['X'], _worker_data['y']
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, **params)
+    model.fit(X[train_idx], y[train_idx])
+    return accuracy_score(y[test_idx], model.predict(X[test_idx]))
+
+
+class RiskModelTuner:
+    """Successive-halving CV search for the risk classifier with an on-disk fold-result cache"""
+
+    def __init__(self, name='student_risk', db_path='school_management.db', cache_dir='ml_model/cache/tuning',
+                 n_folds=5, min_estimators=25, eta=3, max_estimators=225, workers=None):
+        if name not in TUNING_TARGETS:
+            raise ValueError(f"Unknown model '{name}' (choose from {', '.join(TUNING_TARGETS)})")
+        self.name = name
+        self.db_path = db_path
+        self.cache_dir = cache_dir
+        self.n_folds = n_folds
+        self.min_estimators = min_estimators
+        self.eta = eta
+        self.max_estimators = max_estimators
+        self.workers = workers
+        self.registry = ModelRegistry()
+
+    def load_data(self):
+        store = StudentFeatureStore(self.db_path).load()
+        store = store[store['total_classes'] > 0]
+        training_data, _ = TUNING_TARGETS[self.name]
+        return training_data(store)
+
+    @staticmethod
+    def candidates():
+        keys = list(PARAM_GRID)
+        return [dict(zip(keys, values)) for values in itertools.product(*PARAM_GRID.values())]
+
+    def _folds(self, y):
+        smallest_class = np.unique(y, return_counts=True)[1].min() if len(y) else 0  # labels need not start at 0
+        n_splits = max(2, min(self.n_folds, smallest_class or 2))
+        return list(StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+                    .split(np.zeros(len(y)), y))
+
+    @staticmethod
+    def _job_key(params, n_estimators, test_idx):
+        payload = json.dumps([params, n_estimators, hashlib.sha1(test_idx.tobytes()).hexdigest()],
+                             sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:20]
+
+    def _cache_path(self, fingerprint):
+        return os.path.join(self.cache_dir, f"{self.name}_{fingerprint}.json")
+
+    def _read_cache(self, fingerprint):
+        path = self._cache_path(fingerprint)
+        if not os.path.exists(path):
+            return {}
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _write_cache(self, fingerprint, cache):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._cache_path(fingerprint)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+            json.dump(cache, file)
+        os.replace(f"{path}.tmp", path)
+
+    def search(self):
+        """Run the search and return (best_params, best_cv_score, leaderboard)"""
+        X, y = self.load_data()
+        fingerprint = self.registry.fingerprint(X, y)
+        folds = self._folds(y)
+        cache = self._read_cache(fingerprint)
+
+        survivors = self.candidates()
+        n_estimators = self.min_estimators
+        leaderboard = []
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(X, y)) as pool:
+            while True:
+                jobs = {}
+                for params in survivors:
+                    for train_idx, test_idx in folds:
+                        key = self._job_key(params, n_estimators, test_idx)
+                        if key not in cache:
+                            jobs[key] = pool.submit(_score_fold, params, n_estimators, train_idx, test_idx)
+
+                cached = len(survivors) * len(folds) - len(jobs)
+                for key, future in jobs.items():
+                    cache[key] = future.result()
+                self._write_cache(fingerprint, cache)
+
+                scores = [np.mean([cache[self._job_key(params, n_estimators, test_idx)] for _, test_idx in folds])
+                          for params in survivors]
+                ranked = sorted(zip(scores, range(len(survivors))), key=lambda item: (-item[0], item[1]))
+                leaderboard = [(survivors[i], n_estimators, score) for score, i in ranked]
+                print(f"🔎 {len(survivors)} candidates x {len(folds)} folds @ {n_estimators} trees "
+                      f"({len(jobs)} fitted, {cached} from cache) - best CV accuracy {ranked[0][0]:.3f}")
+
+                next_estimators = n_estimators * self.eta
+                if len(survivors) <= 1 or next_estimators > self.max_estimators:
+                    break
+                survivors = [survivors[i] for _, i in ranked[:max(1, math.ceil(len(survivors) / self.eta))]]
+                n_estimators = next_estimators
+
+        best_params, best_estimators, best_score = leaderboard[0]
+        return {**best_params, 'n_estimators': best_estimators}, best_score, leaderboard
+
+    def register_best(self, best_params, cv_score):
+        """Train the winning configuration and make it the current registry version"""
+        X, y = self.load_data()
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
+
+        model = RandomForestClassifier(random_state=42, **best_params)
+        model.fit(X_train, y_train)
+        accuracy = accuracy_score(y_test, model.predict(X_test))
+
+        _, feature_names = TUNING_TARGETS[self.name]
+        return self.registry.save(
+            self.name, model, feature_names, self.registry.fingerprint(X, y),
+            {'accuracy': accuracy, 'cv_accuracy': cv_score, 'samples': len(X)},
+            extra={'tuned_params': best_params}
+        )
+
+
+def main(name='student_risk', workers=None):
+    print("=" * 80)
+    print(f"🎛️ HYPERPARAMETER SEARCH - {name}")
+    print("=" * 80)
+
+    tuner = RiskModelTuner(name=name, workers=workers)
+    best_params, cv_score, leaderboard = tuner.search()
+
+    print("\n🏆 Top configurations:")
+    for params, n_estimators, score in leaderboard[:5]:
+        print(f"  {score:.3f}  n_estimators={n_estimators} {params}")
+
+    meta = tuner.register_best(best_params, cv_score)
+    print(f"\n💾 Registered {name} v{meta['version']} with {best_params}")
+    print(f"✅ CV accuracy {cv_score:.3f}, holdout accuracy {meta['metrics']['accuracy']:.3f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Successive-halving search for the risk classifier")
+    parser.add_argument('--model', choices=list(TUNING_TARGETS), default='student_risk')
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all CPUs)")
+    args = parser.parse_args()
+    main(name=args.model, workers=args.workers)